@@ -0,0 +1,127 @@
+"""Azure 合成器池延迟基准测试（使用本地模拟合成器，无需 Azure 账号）
+
+对比两种方式：
+- per-call: 每次请求新建合成器并写入临时 WAV，再读回解码（原实现）
+- pooled:   从合成器池借用预连接的合成器，直接得到内存中的 PCM
+
+用法: python benchmarks/azure_pool_latency.py --requests 200 --concurrency 4
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.synthesizer_pool import PooledSynthesizer, SynthesizerPool
+
+SAMPLE_RATE = 16000
+
+class FakeResult:
+    def __init__(self, audio_data: bytes):
+        self.reason = "completed"
+        self.audio_data = audio_data
+
+class FakeFuture:
+    def __init__(self, synthesizer, ssml):
+        self._synthesizer = synthesizer
+        self._ssml = ssml
+
+    def get(self):
+        return self._synthesizer.synthesize(self._ssml)
+
+class FakeSynthesizer:
+    """模拟 SpeechSynthesizer：构造时模拟建连耗时，合成时模拟服务端耗时"""
+
+    def __init__(self, connect_latency: float, synth_latency: float, audio_seconds: float):
+        time.sleep(connect_latency)
+        self.synth_latency = synth_latency
+        samples = int(SAMPLE_RATE * audio_seconds)
+        self.pcm = array("h", (int(8000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(samples))).tobytes()
+
+    def speak_ssml_async(self, ssml: str):
+        return FakeFuture(self, ssml)
+
+    def synthesize(self, ssml: str) -> FakeResult:
+        time.sleep(self.synth_latency)
+        return FakeResult(self.pcm)
+
+async def per_call(args, index: int, tmp_dir: Path) -> float:
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    def run():
+        synthesizer = FakeSynthesizer(args.connect_latency, args.synth_latency, args.audio_seconds)
+        result = synthesizer.speak_ssml_async("<speak/>").get()
+        # 原实现：先写临时 WAV，再读回
+        temp_wav = tmp_dir / f"{index:04d}_temp.wav"
+        with wave.open(str(temp_wav), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(result.audio_data)
+        with wave.open(str(temp_wav), "rb") as f:
+            data = f.readframes(f.getnframes())
+        temp_wav.unlink()
+        return data
+
+    await loop.run_in_executor(None, run)
+    return time.perf_counter() - started
+
+async def pooled(args, pool: SynthesizerPool) -> float:
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    async with pool.session("fake-voice") as session:
+        result = await loop.run_in_executor(None, lambda: session.synthesizer.speak_ssml_async("<speak/>").get())
+    memoryview(result.audio_data).cast("h")
+    return time.perf_counter() - started
+
+async def run_batch(coroutine_factory, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            return await coroutine_factory(i)
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(limited(i) for i in range(args.requests)))
+    return latencies, time.perf_counter() - started
+
+def report(name: str, latencies, wall: float):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:>9}: p50 {statistics.median(ordered) * 1000:7.1f}ms  "
+          f"p95 {p95 * 1000:7.1f}ms  total {wall:6.2f}s  ({len(ordered) / wall:6.1f} req/s)")
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        latencies, wall = await run_batch(lambda i: per_call(args, i, tmp_dir), args)
+        report("per-call", latencies, wall)
+
+    pool = SynthesizerPool(
+        lambda voice: PooledSynthesizer(
+            voice_name=voice,
+            synthesizer=FakeSynthesizer(args.connect_latency, args.synth_latency, args.audio_seconds)
+        ),
+        size=args.concurrency
+    )
+    await pool.warm_up("fake-voice", args.concurrency)
+    latencies, wall = await run_batch(lambda i: pooled(args, pool), args)
+    report("pooled", latencies, wall)
+    pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--connect-latency", type=float, default=0.08, help="模拟建立连接耗时（秒）")
+    parser.add_argument("--synth-latency", type=float, default=0.03, help="模拟服务端合成耗时（秒）")
+    parser.add_argument("--audio-seconds", type=float, default=3.0, help="每条合成音频时长（秒）")
+    asyncio.run(main(parser.parse_args()))
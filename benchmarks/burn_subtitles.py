@@ -0,0 +1,97 @@
+"""字幕烧录基准：单进程 libx264 编码 vs. 关键帧分段并行烧录
+
+用 ffmpeg 的 testsrc2 生成测试视频（固定 GOP）和配音音轨，每 2 秒一条字幕，
+分别用两种方式烧录并记录墙钟时间。
+
+用法: python benchmarks/burn_subtitles.py --duration 300 --workers 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.video import (
+    build_ffmpeg_command,
+    burn_segments,
+    calculate_subtitle_params,
+    convert_subtitle_style,
+    read_json_subtitles,
+    run_ffmpeg,
+    write_ass_stream
+)
+
+STYLE = {"fontSize": "48", "color": "#FFFFFF", "strokeColor": "#000000", "strokeWidth": "3"}
+
+def make_inputs(directory: Path, duration: int, gop: int) -> dict:
+    video = directory / "source.mp4"
+    audio = directory / "dub.mp3"
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1920x1080:rate=30:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(gop), str(video)
+    ], check=True)
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:a', 'libmp3lame', str(audio)
+    ], check=True)
+
+    subtitle = directory / "subtitles.json"
+    with open(subtitle, 'w', encoding='utf-8') as f:
+        json.dump([
+            {"start": t, "duration": 1.8, "text": f"Subtitle line {t // 2} 字幕测试"}
+            for t in range(0, duration, 2)
+        ], f, ensure_ascii=False)
+
+    return {
+        'video': video,
+        'subtitle': subtitle,
+        'audio': audio,
+        'ass': directory / "subtitles.ass",
+        'font': Path("static/fonts/SimSun.ttf")
+    }
+
+async def burn_single(paths: dict):
+    params = calculate_subtitle_params(STYLE)
+    write_ass_stream(paths['ass'], read_json_subtitles(paths['subtitle']), {
+        **convert_subtitle_style(STYLE), 'marginV': str(params['margin_v'])
+    })
+    await run_ffmpeg(build_ffmpeg_command(paths, params))
+
+async def burn_parallel(paths: dict, workers: int):
+    params = calculate_subtitle_params(STYLE)
+    await burn_segments(paths, {
+        **convert_subtitle_style(STYLE), 'marginV': str(params['margin_v'])
+    }, workers=workers)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=300, help="测试视频时长(秒)")
+    parser.add_argument("--gop", type=int, default=60, help="测试视频关键帧间隔(帧)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        paths = make_inputs(directory, args.duration, args.gop)
+
+        runs = [("single", lambda out: burn_single({**paths, 'output': out}))]
+        for workers in args.workers:
+            runs.append((f"parallel x{workers}", lambda out, w=workers: burn_parallel({**paths, 'output': out}, w)))
+
+        print(f"{'method':>14} {'seconds':>9} {'realtime':>9}")
+        for name, run in runs:
+            output = directory / f"{name.replace(' ', '_')}.mp4"
+            started = time.perf_counter()
+            asyncio.run(run(output))
+            elapsed = time.perf_counter() - started
+            print(f"{name:>14} {elapsed:>9.1f} {args.duration / elapsed:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""edge-tts 连接池检查：本地 WebSocket 替身服务（无需访问微软服务）
+
+替身服务按 edge-tts 协议应答：收到 SSML 后分块返回"音频"（内容为请求文本，便于核对），
+再发送 turn.end。依次检查：
+- 连接复用：顺序发送多条请求只建立一条连接
+- 断线重连：服务端在收到请求后直接断开，连接池重连并重试该请求
+- 接收超时：服务端收到请求后不再应答，超过 receive_timeout 后重连并重试该请求
+- 并发请求：多条请求同时进入连接池，每条都收到自己的音频，连接数不超过池大小
+
+用法: python benchmarks/edge_session_stand_in.py --requests 30 --pool-size 3 --latency 0.02
+"""
+import argparse
+import asyncio
+import re
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import WSMsgType, web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.edge_session import EdgeSessionManager
+
+class StandInServer:
+    """模拟 edge-tts WebSocket 服务"""
+
+    def __init__(self, latency: float = 0.0, drop_on: tuple = (), silent_on: tuple = ()):
+        self.latency = latency
+        self.drop_on = set(drop_on)
+        self.silent_on = set(silent_on)
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/edge", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/edge"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                head, _, body = message.data.partition("\r\n\r\n")
+                headers = dict(line.split(":", 1) for line in head.split("\r\n"))
+                if headers.get("Path") != "ssml":
+                    continue
+
+                self.requests += 1
+                if self.requests in self.drop_on:
+                    # 模拟服务端在请求中途断开连接
+                    await ws.close()
+                    break
+                if self.requests in self.silent_on:
+                    # 模拟服务端收到请求后不再应答
+                    continue
+
+                request_id = headers["X-RequestId"]
+                text = re.search(r"<prosody[^>]*>(.*)</prosody>", body).group(1).encode("utf-8")
+                await asyncio.sleep(self.latency)
+                middle = len(text) // 2
+                for chunk in (text[:middle], text[middle:]):
+                    audio_headers = (
+                        f"X-RequestId:{request_id}\r\n"
+                        "Content-Type:audio/mpeg\r\n"
+                        "Path:audio\r\n"
+                    ).encode("utf-8")
+                    await ws.send_bytes(len(audio_headers).to_bytes(2, "big") + audio_headers + chunk)
+                await ws.send_str(
+                    f"X-RequestId:{request_id}\r\n"
+                    "Content-Type:application/json; charset=utf-8\r\n"
+                    "Path:turn.end\r\n\r\n{}"
+                )
+        finally:
+            self.active -= 1
+        return ws
+
+async def synthesize(manager: EdgeSessionManager, text: str) -> str:
+    chunks = [chunk async for chunk in manager.stream(text, "zh-CN-XiaoxiaoNeural")]
+    return b"".join(chunks).decode("utf-8")
+
+async def check_reuse(requests: int, latency: float):
+    server = StandInServer(latency)
+    await server.start()
+    manager = EdgeSessionManager(size=1, endpoint=server.url)
+    try:
+        for i in range(requests):
+            assert await synthesize(manager, f"第 {i} 条字幕") == f"第 {i} 条字幕"
+        stats = manager.stats()[0]
+        assert server.connections == 1, f"建立了 {server.connections} 条连接"
+        assert stats["connects"] == 1 and stats["requests"] == requests, stats
+    finally:
+        await manager.close()
+        await server.stop()
+    print(f"连接复用: {requests} 条顺序请求共用 1 条连接")
+
+async def check_reconnect(latency: float):
+    server = StandInServer(latency, drop_on=(3,))
+    await server.start()
+    manager = EdgeSessionManager(size=1, endpoint=server.url)
+    try:
+        for i in range(5):
+            assert await synthesize(manager, f"line {i}") == f"line {i}"
+        stats = manager.stats()[0]
+        assert server.connections == 2, f"建立了 {server.connections} 条连接"
+        assert stats["connects"] == 2 and stats["errors"] == 1 and stats["requests"] == 5, stats
+    finally:
+        await manager.close()
+        await server.stop()
+    print("断线重连: 第 3 条请求时服务端断开，重连后重试成功，5 条请求全部完成")
+
+async def check_receive_timeout(latency: float):
+    server = StandInServer(latency, silent_on=(2,))
+    await server.start()
+    manager = EdgeSessionManager(size=1, endpoint=server.url, receive_timeout=0.5)
+    try:
+        for i in range(3):
+            assert await synthesize(manager, f"line {i}") == f"line {i}"
+        stats = manager.stats()[0]
+        assert server.connections == 2, f"建立了 {server.connections} 条连接"
+        assert stats["connects"] == 2 and stats["errors"] == 1 and stats["requests"] == 3, stats
+    finally:
+        await manager.close()
+        await server.stop()
+    print("接收超时: 第 2 条请求服务端无应答，超时后重连重试成功，3 条请求全部完成")
+
+async def check_concurrency(requests: int, pool_size: int, latency: float):
+    server = StandInServer(latency)
+    await server.start()
+    manager = EdgeSessionManager(size=pool_size, endpoint=server.url)
+    try:
+        texts = [f"concurrent {i} 并发" for i in range(requests)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*[synthesize(manager, text) for text in texts])
+        elapsed = time.perf_counter() - started
+        assert results == texts, "音频与请求不对应"
+        assert server.connections <= pool_size, f"建立了 {server.connections} 条连接"
+        assert sum(s["requests"] for s in manager.stats()) == requests
+    finally:
+        await manager.close()
+        await server.stop()
+    print(
+        f"并发请求: {requests} 条请求，{server.connections} 条连接（池大小 {pool_size}），"
+        f"耗时 {elapsed:.2f}s（单连接串行约 {requests * latency:.2f}s）"
+    )
+
+async def run(args):
+    await check_reuse(args.requests, args.latency)
+    await check_reconnect(args.latency)
+    await check_receive_timeout(args.latency)
+    await check_concurrency(args.requests, args.pool_size, args.latency)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="替身服务每条请求的模拟耗时(秒)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""编码档位基准：各档位的编码速度 (fps) 和输出大小
+
+用 ffmpeg 的 testsrc2 生成测试视频和配音音轨，每 2 秒一条字幕，
+按 ENCODE_PROFILES 中的每个档位烧录并记录编码帧率和输出文件大小。
+
+用法: python benchmarks/encode_profiles.py --duration 120 --size 1920x1080 --profiles draft standard archive
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.config import ENCODE_PROFILES
+from modules.video import (
+    build_ffmpeg_command,
+    calculate_subtitle_params,
+    convert_subtitle_style,
+    read_json_subtitles,
+    run_ffmpeg,
+    write_ass_stream
+)
+
+STYLE = {"fontSize": "48", "color": "#FFFFFF", "strokeColor": "#000000", "strokeWidth": "3"}
+
+def make_inputs(directory: Path, duration: int, size: str, rate: int) -> dict:
+    video = directory / "source.mp4"
+    audio = directory / "dub.mp3"
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '12', str(video)
+    ], check=True)
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:a', 'libmp3lame', str(audio)
+    ], check=True)
+
+    subtitle = directory / "subtitles.json"
+    with open(subtitle, 'w', encoding='utf-8') as f:
+        json.dump([
+            {"start": t, "duration": 1.8, "text": f"Subtitle line {t // 2} 字幕测试"}
+            for t in range(0, duration, 2)
+        ], f, ensure_ascii=False)
+
+    return {
+        'video': video,
+        'subtitle': subtitle,
+        'audio': audio,
+        'ass': directory / "subtitles.ass",
+        'font': Path("static/fonts/SimSun.ttf")
+    }
+
+async def burn(paths: dict, profile: dict):
+    params = calculate_subtitle_params(STYLE)
+    write_ass_stream(paths['ass'], read_json_subtitles(paths['subtitle']), {
+        **convert_subtitle_style(STYLE), 'marginV': str(params['margin_v'])
+    })
+    await run_ffmpeg(build_ffmpeg_command(paths, params, profile))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=int, default=120, help="测试视频时长(秒)")
+    parser.add_argument("--size", default="1920x1080", help="测试视频分辨率")
+    parser.add_argument("--rate", type=int, default=30, help="测试视频帧率")
+    parser.add_argument("--profiles", nargs="+", default=list(ENCODE_PROFILES), choices=list(ENCODE_PROFILES))
+    args = parser.parse_args()
+
+    frames = args.duration * args.rate
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        paths = make_inputs(directory, args.duration, args.size, args.rate)
+
+        print(f"{'profile':>10} {'seconds':>9} {'fps':>8} {'size MB':>9} {'kbps':>8}")
+        for name in args.profiles:
+            output = directory / f"{name}.mp4"
+            started = time.perf_counter()
+            asyncio.run(burn({**paths, 'output': output}, ENCODE_PROFILES[name]))
+            elapsed = time.perf_counter() - started
+            size = output.stat().st_size
+            print(
+                f"{name:>10} {elapsed:>9.1f} {frames / elapsed:>8.1f} "
+                f"{size / 1e6:>9.2f} {size * 8 / args.duration / 1000:>8.0f}"
+            )
+
+if __name__ == "__main__":
+    main()
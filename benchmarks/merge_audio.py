@@ -0,0 +1,110 @@
+"""合并配音基准：原 ffmpeg amix 滤镜图 vs. 进程内 NumPy 混音器
+
+生成合成的 FLAC 片段（每条 1~3 秒，首尾相接）和一条背景音轨，
+分别用两种方式合并为 MP3，记录耗时和峰值内存。片段数很多时 ffmpeg
+可能因为参数长度或文件描述符限制而失败，失败原因会一并打印。
+
+用法: python benchmarks/merge_audio.py --clips 100 1000 5000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.config import MERGE_SAMPLE_RATE, MERGE_BACKGROUND_GAIN
+from modules.mixer import MixClip, background_cache, mix_timeline
+from modules.window_cache import WindowCache
+
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+
+def make_corpus(directory: Path, count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    clips, cursor = [], 0.0
+    for index in range(count):
+        sample_rate = int(rng.choice([16000, 24000]))
+        duration = rng.uniform(1.0, 3.0)
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        samples = (0.3 * np.sin(2 * np.pi * rng.uniform(120, 300) * t)).astype(np.float32)
+        path = directory / f"{index:04d}.flac"
+        sf.write(str(path), samples, sample_rate, format="FLAC", subtype="PCM_16")
+        clips.append(MixClip(index=index, path=path, start=cursor, duration=duration))
+        cursor += duration + rng.uniform(0.1, 0.5)
+
+    background = directory / "background.wav"
+    noise = rng.normal(0, 0.05, int(cursor * 16000)).astype(np.float32)
+    sf.write(str(background), noise, 16000)
+    return clips, background, cursor
+
+def merge_ffmpeg(clips, background: Path, total_duration: float, output: Path, volume: float):
+    """原 merge_audio 构建的滤镜图"""
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error']
+    for clip in clips:
+        cmd.extend(['-i', str(clip.path)])
+    cmd.extend(['-i', str(background)])
+
+    filter_complex = ''.join(
+        f'[{i}:a]atrim=0:{clip.duration},adelay={int(clip.start*1000)}|{int(clip.start*1000)}:all=1[delayed{i}];'
+        for i, clip in enumerate(clips)
+    )
+    merge_cmd = ''.join(f'[delayed{i}]' for i in range(len(clips)))
+    filter_complex += f'{merge_cmd}amix=inputs={len(clips)}:dropout_transition=0[speech];'
+    filter_complex += f'[{len(clips)}:a]volume={volume}[bg];'
+    filter_complex += '[speech]volume=2[speech_adjusted];'
+    filter_complex += '[speech_adjusted][bg]amix=inputs=2:duration=first[premix];'
+    filter_complex += f'[premix]{LOUDNORM_FILTER}[aout]'
+
+    cmd.extend([
+        '-filter_complex', filter_complex, '-map', '[aout]', '-t', str(total_duration),
+        '-codec:a', 'libmp3lame', '-q:a', '2', str(output)
+    ])
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "ffmpeg 失败")
+
+def merge_numpy(clips, background: Path, total_duration: float, output: Path, volume: float):
+    mix_timeline(
+        clips, total_duration, output, MERGE_SAMPLE_RATE,
+        WindowCache(output.with_suffix(".windows")),
+        background_path=background_cache(background, MERGE_SAMPLE_RATE),
+        background_gain=volume * MERGE_BACKGROUND_GAIN
+    )
+
+def children_peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+def self_peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--volume", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'clips':>6} {'method':>8} {'seconds':>9} {'peak MB':>9}  note")
+    for count in args.clips:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            clips, background, total_duration = make_corpus(directory, count)
+            for name, merge in (("ffmpeg", merge_ffmpeg), ("numpy", merge_numpy)):
+                output = directory / f"{name}.mp3"
+                started = time.perf_counter()
+                note = f"{total_duration:.0f}s timeline"
+                try:
+                    merge(clips, background, total_duration, output, args.volume)
+                except Exception as e:
+                    note = f"失败: {str(e)[:60]}"
+                elapsed = time.perf_counter() - started
+                peak = children_peak_mb() if name == "ffmpeg" else self_peak_mb()
+                print(f"{count:>6} {name:>8} {elapsed:>9.2f} {peak:>9.0f}  {note}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""静音裁剪微基准：原逐帧 Python 实现 vs. 向量化实现
+
+默认使用合成的语料（随机长度的语音段 + 首尾静音）；也可以用 --corpus
+指定一个包含 FLAC/WAV 片段的目录，例如 audio/<file_id>/<lang>。
+
+用法: python benchmarks/trim_silence.py --clips 500
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.silence import trim_silence
+
+def trim_silence_end_reference(audio_data, sample_rate, threshold=0.01, min_silence_duration=0.1):
+    """原 speech.trim_silence_end 的实现，作为对照"""
+    frame_length = int(sample_rate * 0.02)
+    energy = np.array([
+        np.sqrt(np.mean(frame**2))
+        for frame in np.array_split(audio_data, len(audio_data) // frame_length)
+    ])
+    min_silence_frames = int(min_silence_duration * sample_rate / frame_length)
+    silence_count = 0
+    end_frame = len(energy) - 1
+    for i in range(len(energy) - 1, -1, -1):
+        if energy[i] > threshold:
+            end_frame = i + 1
+            break
+        silence_count += 1
+        if silence_count < min_silence_frames:
+            end_frame = i
+    end_sample = min(len(audio_data), (end_frame + 1) * frame_length)
+    return audio_data[:end_sample]
+
+def synthetic_corpus(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(count):
+        sample_rate = int(rng.choice([16000, 24000]))
+        lead, speech, tail = rng.uniform(0, 0.3), rng.uniform(0.5, 6.0), rng.uniform(0.1, 1.0)
+        t = np.arange(int(speech * sample_rate)) / sample_rate
+        voiced = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+        clip = np.concatenate([
+            rng.normal(0, 0.001, int(lead * sample_rate)),
+            voiced,
+            rng.normal(0, 0.001, int(tail * sample_rate)),
+        ]).astype(np.float32)
+        corpus.append((clip, sample_rate))
+    return corpus
+
+def load_corpus(directory: Path):
+    import soundfile as sf
+    corpus = []
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() in (".flac", ".wav"):
+            samples, sample_rate = sf.read(str(path), dtype="float32", always_2d=False)
+            corpus.append((samples, sample_rate))
+    return corpus
+
+def measure(name: str, func, corpus, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for samples, sample_rate in corpus:
+            func(samples, sample_rate)
+        best = min(best, time.perf_counter() - started)
+    audio_seconds = sum(len(s) / r for s, r in corpus)
+    print(f"{name:>10}: {best * 1000:8.1f}ms for {len(corpus)} clips "
+          f"({audio_seconds / best:8.0f}x realtime)")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=500)
+    parser.add_argument("--corpus", type=Path, help="包含 FLAC/WAV 片段的目录")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.clips)
+    reference = measure("reference", trim_silence_end_reference, corpus, args.repeat)
+    vectorized = measure("vectorized", trim_silence, corpus, args.repeat)
+    print(f"speedup: {reference / vectorized:.1f}x")
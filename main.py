@@ -21,9 +21,12 @@ from modules import (
     speech, 
     translation, 
     video,
-    utils
+    utils,
+    tts
 )
-from modules.config import DIRS, UPLOAD_DIR, SUBTITLE_DIR, TEMP_DIR, AUDIO_DIR
+from modules.config import DIRS, UPLOAD_DIR, SUBTITLE_DIR, TEMP_DIR, AUDIO_DIR, MEZZANINE_INGEST
+from modules.mezzanine import mezzanine_ingest
+from modules.rate_model import rate_model
 from pydantic import BaseModel
 from typing import Optional
 
@@ -40,6 +43,7 @@ class SingleSpeechRequest(BaseModel):
     use_local_tts: bool = False
     voice_name: Optional[str] = None
     speed: float = 1.0  # 添加语速参数，默认值为1.0
+    auto_fit: bool = False  # 按语速模型自动选择能放进可用时长的语速
 
 # 创建必要的目录
 for dir_path in DIRS:
@@ -75,7 +79,8 @@ async def serve_video(file_id: str):
 @app.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    file_id: str = Form(None)
+    file_id: str = Form(None),
+    ingest: Optional[bool] = Form(None)
 ):
     try:
         if file_id:
@@ -83,11 +88,19 @@ async def upload_file(
             actual_file_id = await utils.save_upload_file(file, file_id)
         else:
             actual_file_id = await utils.save_upload_file(file)
+
+        # 后台生成固定关键帧间隔的中间文件，完成前下游处理仍使用上传文件
+        if MEZZANINE_INGEST if ingest is None else ingest:
+            mezzanine_ingest.start(actual_file_id)
         
         return {"file_id": actual_file_id}
     except Exception as e:
         raise HTTPException(500, f"上传失败: {str(e)}")
 
+@app.get("/ingest-status/{file_id}")
+async def ingest_status(file_id: str):
+    return {"file_id": file_id, "status": mezzanine_ingest.status(file_id)}
+
 @app.websocket("/ws/{file_id}")
 async def websocket_endpoint(ws: WebSocket, file_id: str):
     await websocket.handle_websocket(ws, file_id)
@@ -150,6 +163,11 @@ async def get_available_voices(language: str):
     except Exception as e:
         raise HTTPException(500, f"获取语音列表失败: {str(e)}")
 
+@app.get("/tts/edge-stats")
+async def edge_tts_stats_endpoint():
+    """edge-tts 连接池每条连接的吞吐统计"""
+    return {"connections": tts.edge_tts_engine.sessions.stats()}
+
 @app.post("/generate-speech/{file_id}")
 async def generate_speech_endpoint(
     file_id: str,
@@ -161,7 +179,9 @@ async def generate_speech_endpoint(
             target_language=params.get('target_language'),
             voice_name=params.get('voice_name'),
             speed = params.get('speed'),
-            use_local_tts=params.get('use_local_tts', False)
+            use_local_tts=params.get('use_local_tts', False),
+            batch=params.get('batch', False),
+            auto_fit=params.get('auto_fit', False)
         )
     except Exception as e:
         raise HTTPException(500, str(e))
@@ -175,7 +195,10 @@ async def generate_speech_single_endpoint(
     target_language: str = "en-US",
     speed: float = 1.0
 ):
-    return await speech.generate_speech(file_id, subtitle_index, text, voice_name, target_language, speed)
+    try:
+        return await speech.generate_speech(file_id, subtitle_index, text, voice_name, target_language, speed)
+    finally:
+        rate_model.flush()
 
 @app.post("/merge-audio/{file_id}")
 async def merge_audio_endpoint(file_id: str, target_language: str, include_original: bool = True, volume: float = 1.0):
@@ -185,9 +208,36 @@ async def merge_audio_endpoint(file_id: str, target_language: str, include_origi
 async def burn_subtitles_endpoint(
     file_id: str, 
     language: str, 
+    style: dict = Body(...),
+    mode: str = "single",
+    container: str = "mkv",
+    profile: str = "standard"
+):
+    return await video.burn_subtitles(file_id, language, style, mode, container, profile)
+
+@app.post("/burn-subtitles-multi/{file_id}")
+async def burn_subtitles_multi_endpoint(
+    file_id: str,
+    languages: str,
+    style: dict = Body(...),
+    profile: str = "standard"
+):
+    """languages 为逗号分隔的语言列表，例如 en,ja"""
+    return await video.burn_subtitles_multi(file_id, languages.split(','), style, profile)
+
+@app.post("/burn-preview/{file_id}")
+async def burn_preview_endpoint(
+    file_id: str,
+    language: str,
+    timestamp: float,
+    duration: float = 10.0,
     style: dict = Body(...)
 ):
-    return await video.burn_subtitles(file_id, language, style)
+    return await video.render_preview(file_id, language, style, timestamp, duration)
+
+@app.post("/burn-subtitles/{file_id}/cancel")
+async def cancel_burn_endpoint(file_id: str):
+    return await video.cancel_burn(file_id)
 
 @app.put("/update-subtitles/{file_id}")
 async def update_subtitles_endpoint(file_id: str, data: dict):
@@ -356,7 +406,8 @@ async def generate_single_speech_endpoint(
         target_language=request.target_language,
         use_local_tts=request.use_local_tts,
         voice_name=request.voice_name,
-        speed=request.speed
+        speed=request.speed,
+        auto_fit=request.auto_fit
     )
 
 
@@ -1,3 +1,4 @@
+import shutil
 import subprocess
 from fastapi import HTTPException
 from pathlib import Path
@@ -7,8 +8,16 @@ from .config import (
     UPLOAD_DIR, 
     TEMP_DIR, 
     MERGED_DIR,
-    SUBTITLE_DIR
+    SUBTITLE_DIR,
+    MERGE_SAMPLE_RATE,
+    MERGE_SPEECH_GAIN,
+    MERGE_BACKGROUND_GAIN,
+    MAX_STRETCH_RATIO,
+    WINDOW_CACHE_DIR
 )
+from .clips import ClipIndex, clip_path
+from .mixer import MixClip, background_cache, mix_timeline
+from .window_cache import WindowCache
 import asyncio
 import json
 from dataclasses import dataclass, asdict
@@ -106,19 +115,6 @@ class AudioProcessingError(Exception):
     """Custom exception for audio processing errors"""
     pass
 
-def get_audio_duration(file_path: Path) -> float:
-    """Get the duration of an audio file using ffprobe."""
-    try:
-        output = subprocess.check_output([
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            str(file_path)
-        ]).decode().strip()
-        return float(output)
-    except subprocess.CalledProcessError as e:
-        raise AudioProcessingError(f"Failed to get audio duration: {str(e)}")
-
 def create_silence(output_path: Path, duration: float) -> None:
     """Create a silent audio file of specified duration."""
     try:
@@ -133,52 +129,6 @@ def create_silence(output_path: Path, duration: float) -> None:
     except subprocess.CalledProcessError as e:
         raise AudioProcessingError(f"Failed to create silence: {e.stderr}")
 
-def process_audio_file(
-    audio_file: Path,
-    subtitle: Dict[str, Any],
-    batch_start: float,
-    batch_duration: float,
-    global_index: int
-) -> Optional[Tuple[str, float, Path]]:  # Modified return type to include audio file
-    """Process a single audio file and return its filter command, duration, and file path."""
-    try:
-        logger.info(f"\nProcessing subtitle {global_index:04d}")
-        logger.info(f"Subtitle content: {subtitle.get('text', '')}")
-        logger.info(f"Subtitle timing: {subtitle['start']:.3f} -> {subtitle['start'] + subtitle['duration']:.3f}")
-        logger.info(f"Checking audio file: {audio_file}")
-
-        if not audio_file.exists():
-            logger.warning(f"❌ Audio file not found: {audio_file}")
-            return None
-
-        file_size = audio_file.stat().st_size
-        logger.info(f"Found audio file {global_index:04d}.mp3")
-
-        audio_duration = get_audio_duration(audio_file)
-        target_duration = float(subtitle['duration'])
-        relative_start = float(subtitle['start']) - batch_start
-
-        logger.info(f"✅ Processing audio:")
-        logger.info(f"  - File size: {file_size/1024:.1f}KB")
-        logger.info(f"  - Original duration: {audio_duration:.3f}s")
-        logger.info(f"  - Target duration: {target_duration:.3f}s")
-        logger.info(f"  - Relative start time: {relative_start:.3f}s")
-
-        filter_cmd = (
-            f'volume={AudioConfig.VOLUME_ADJUSTMENT},'
-            f'atrim=0:{target_duration},'
-            f'asetpts=PTS-STARTPTS,'
-            f'adelay={int(relative_start*1000)}|{int(relative_start*1000)},'
-            f'apad=whole_dur={batch_duration}'
-        )
-
-        logger.info("  - Filter command created successfully")
-        return filter_cmd, audio_duration, audio_file
-
-    except Exception as e:
-        logger.error(f"❌ Failed to process audio file {audio_file}: {str(e)}")
-        return None
-    
 async def merge_audio(file_id: str, target_language: str, include_original: bool = True, volume: float = 1.0):
     try:
         # 验证目录和文件
@@ -216,16 +166,15 @@ async def merge_audio(file_id: str, target_language: str, include_original: bool
         valid_audio_count = 0
         duration_warnings = []
         processed_files = []
-        inputs = []
-        filter_parts = []
         input_files = []  # 新增：用于���储有效的音频文件
 
-        # 首先收集所有有效的频文件
+        # 首先收集所有有效的频文件，时长从片段索引读取，不调用 ffprobe
+        clip_index = ClipIndex(audio_dir)
         for i, subtitle in enumerate(subtitles):
-            audio_file = audio_dir / f"{i:04d}.mp3"
+            audio_file = clip_path(audio_dir, i)
             if audio_file.exists():
                 try:
-                    audio_duration = get_audio_duration(audio_file)
+                    audio_duration = clip_index.duration(i)
                     target_duration = float(subtitle['duration'])
                     start_time = float(subtitle["start"])
                     
@@ -235,7 +184,7 @@ async def merge_audio(file_id: str, target_language: str, include_original: bool
                     logger.info(f"- 实际时长: {audio_duration}s")
                     
                     # 添加到输入文件列表
-                    input_files.append((audio_file, start_time, target_duration))
+                    input_files.append((audio_file, start_time, target_duration, audio_duration))
                     processed_files.append(str(audio_file))
                     
                 except Exception as e:
@@ -243,98 +192,65 @@ async def merge_audio(file_id: str, target_language: str, include_original: bool
                     continue
 
         if input_files:
-            # 构建 FFmpeg 命令
-            cmd = ['ffmpeg', '-y']
-            
-            # 添加所有输入文件
-            for audio_file, _, _ in input_files:
-                cmd.extend(['-i', str(audio_file)])
-                
-            # 添加原始音频文件（如果存在）
-            has_original_audio = original_audio.exists()
-            if has_original_audio:
-                cmd.extend(['-i', str(original_audio)])
-            
-            # 构建过滤器命令
-            filter_parts = []
-
-            for i, (_, start_time, target_duration) in enumerate(input_files):
-                # 获取当前音频文件的实际时长
-                current_audio = input_files[i][0]
-                actual_duration = get_audio_duration(current_audio)
+            mix_clips = []
+            for i, (audio_file, start_time, target_duration, actual_duration) in enumerate(input_files):
                 
                 # 计算到下一个字幕的间隔时间
                 next_start = input_files[i + 1][1] if i + 1 < len(input_files) else total_duration
                 available_gap = next_start - (start_time + target_duration)
                 
-                # 决定最终使用的音频时长
-                if actual_duration > target_duration and available_gap > 0:
-                    # 如果音频超长且有间隔时间，使用实际音频时长和可用间隔中的较小值
-                    final_duration = min(actual_duration, target_duration + available_gap)
-                else:
-                    # 否则使用目标时长
-                    final_duration = target_duration
+                # 片段超出可用时长（目标时长加上到下一条字幕的间隔）时，
+                # 混合时用 WSOLA 压缩到可用时长内，超过最大压缩比例的部分再截断
+                slot_duration = target_duration + max(available_gap, 0)
+                stretch = 1.0
+                if slot_duration > 0 and actual_duration > slot_duration:
+                    stretch = min(actual_duration / slot_duration, MAX_STRETCH_RATIO)
+                final_duration = min(actual_duration / stretch, slot_duration)
                 
-                filter_parts.append(
-                    f'[{i}:a]'
-                    f'atrim=0:{final_duration},'  # 使用计算后的最终时长
-                    f'adelay={int(start_time*1000)}|{int(start_time*1000)}:all=1'
-                    f'[delayed{i}];'
-                )
+                mix_clips.append(MixClip(
+                    index=int(audio_file.stem),
+                    path=audio_file,
+                    start=start_time,
+                    duration=final_duration,
+                    gain=MERGE_SPEECH_GAIN,
+                    stretch=stretch
+                ))
                 
                 logger.info(f"处理音频 {i}:")
                 logger.info(f"- 开始时间: {start_time:.3f}s")
                 logger.info(f"- 目标时长: {target_duration:.3f}s")
                 logger.info(f"- 实际时长: {actual_duration:.3f}s")
                 logger.info(f"- 可用间隔: {available_gap:.3f}s")
+                logger.info(f"- 变速比例: {stretch:.3f}")
                 logger.info(f"- 最终时长: {final_duration:.3f}s")
 
+            # 背景音轨解码一次，各渲染进程以内存映射方式读取
+            background_path = None
+            if original_audio.exists() and include_original:
+                background_path = background_cache(original_audio, MERGE_SAMPLE_RATE)
 
-            # 合并所有音频轨道
-            filter_complex = ''.join(filter_parts)
-            
-            # 处理原始音频（如果存在且用户选择包含）
-            if has_original_audio and include_original:
-                # 先混合所有语音轨道
-                merge_cmd = ''.join(f'[delayed{i}]' for i in range(len(input_files)))
-                filter_complex += f'{merge_cmd}amix=inputs={len(input_files)}:dropout_transition=0[speech];'  # 混合语音轨道
-                # 调整原始音频音量
-                filter_complex += f'[{len(input_files)}:a]volume={volume}[bg];'  # 使用传入的volume参数调整背景音量
-                # 混合语音和背景音频
-                filter_complex += '[speech]volume=2[speech_adjusted];'  # 调整语音音量
-                filter_complex += '[speech_adjusted][bg]amix=inputs=2:duration=first[premix];'
-                filter_complex += '[premix]loudnorm=I=-16:TP=-1.5:LRA=11[aout]'  # 添加 loudnorm 滤镜
-            else:
-                # 如果没有原始音频，直接合并语音轨道
-                merge_cmd = ''.join(f'[delayed{i}]' for i in range(len(input_files)))
-                filter_complex += f'{merge_cmd}amix=inputs={len(input_files)}:dropout_transition=0,'
-                filter_complex += 'loudnorm=I=-16:TP=-1.5:LRA=11[aout]'  # 添加 loudnorm 滤镜
-            
-            # 完成命令构建
-            cmd.extend([
-                '-filter_complex', filter_complex,
-                '-map', '[aout]',
-                '-t', str(total_duration),
-                '-codec:a', 'libmp3lame',
-                '-q:a', '2',
-                str(final_output)
-            ])
-            
-            # 执行命令
-            logger.info("\n执行FFmpeg命令:")
-            logger.info(' '.join(cmd))
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg合并失败: {result.stderr}")
-                raise AudioProcessingError(f"音频合并失败: {result.stderr}")
+            # 按窗口并行混合所有片段，在进程内做 EBU R128 响度归一化，再按顺序送入编码器；
+            # 已渲染的窗口及其响度统计缓存在磁盘上，只重新渲染片段或背景音量变化的窗口
+            logger.info(f"\n混合 {len(mix_clips)} 个语音片段")
+            # 旧版本把窗口缓存放在合成目录（公开目录），迁移后删除
+            shutil.rmtree(output_dir / f"{target_language}.windows", ignore_errors=True)
+            window_cache = WindowCache(WINDOW_CACHE_DIR / file_id / target_language)
+            loop = asyncio.get_running_loop()
+            final_duration, loudness = await loop.run_in_executor(None, lambda: mix_timeline(
+                mix_clips,
+                total_duration,
+                final_output,
+                MERGE_SAMPLE_RATE,
+                window_cache,
+                background_path=background_path,
+                background_gain=volume * MERGE_BACKGROUND_GAIN
+            ))
             
             # 验证最终文件
             if not final_output.exists():
                 raise AudioProcessingError("最终文件未生成")
             
-            final_duration = get_audio_duration(final_output)
+            logger.info(f"归一化前综合响度: {loudness:.1f} LUFS")
             logger.info(f"合并完成! 最终文件: {final_output}")
             logger.info(f"最终时长: {final_duration:.2f}秒")
             
@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from .clips import file_stamp
+from .window_cache import signature
+
+SEGMENT_MANIFEST = "segments.json"
+
+def segment_signature(
+    video_path: Path, start: float, end: float, cues: list, ass_style: dict, profile: dict
+) -> str:
+    """分段的烧录指纹：源视频（修改时间、大小）、分段范围、平移后的字幕、样式和编码档位"""
+    return signature(
+        video_path.name, file_stamp(video_path), round(start, 6), round(end, 6), cues, ass_style, profile
+    )
+
+class SegmentCache:
+    """SEGMENT_CACHE_DIR/<输出名>：分段烧录结果缓存
+
+    segments.json 记录每个分段的范围和烧录指纹（包含平移后的重叠字幕），分段文件按
+    指纹命名。重新烧录时只编码指纹变化（重叠字幕或样式改变）的分段，其余分段
+    直接用 concat 流复制进新的输出。
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.path = cache_dir / SEGMENT_MANIFEST
+        self.segments: List[Dict] = []
+        self.load()
+
+    def load(self):
+        """读取缓存清单，文件不存在或损坏时视为空缓存"""
+        self.segments = []
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.segments = json.load(f).get("segments", [])
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            print(f"读取分段缓存清单失败，将全部重新编码: {str(e)}")
+
+    def segment_path(self, sig: str) -> Path:
+        return self.cache_dir / f"{sig[:16]}.mp4"
+
+    def temp_path(self, sig: str) -> Path:
+        """编码中的分段先写到临时文件，完成后再改名，避免半成品被当作缓存"""
+        return self.cache_dir / f"{sig[:16]}.tmp.mp4"
+
+    def commit(self, sig: str):
+        os.replace(self.temp_path(sig), self.segment_path(sig))
+
+    def is_cached(self, sig: str) -> bool:
+        path = self.segment_path(sig)
+        return path.exists() and path.stat().st_size > 0
+
+    def save(self, segments: List[Dict]):
+        """原子写入缓存清单，并删除不再引用的分段文件
+        Args:
+            segments: [{"start", "end", "sig"}]
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.segments = segments
+
+        keep = {self.segment_path(segment["sig"]).name for segment in segments}
+        for path in self.cache_dir.iterdir():
+            if path.suffix in (".mp4", ".ass") and path.name not in keep:
+                path.unlink(missing_ok=True)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from .config import BURN_TIMEOUT_SECONDS, BURN_PROGRESS_INTERVAL
+from .websocket import send_message
+
+STDERR_TAIL_LINES = 40
+
+class BurnCancelled(Exception):
+    """烧录任务被取消"""
+    pass
+
+class BurnJob:
+    """一次烧录任务：跟踪其 ffmpeg 进程，解析 -progress 输出推送进度，支持取消和超时
+
+    并行烧录时每个分段占一个 slot，进度按各 slot 已编码时长之和计算。
+    """
+
+    def __init__(self, file_id: str, duration: float, timeout: float = BURN_TIMEOUT_SECONDS):
+        self.file_id = file_id
+        self.duration = duration
+        self.deadline = time.monotonic() + timeout
+        self.cancelled = False
+        self.stage = "烧录字幕"
+        self.processes = set()
+        self.positions: Dict[int, float] = {}
+        self.fps: Dict[int, float] = {}
+        self._last_report = 0.0
+
+    @property
+    def progress(self) -> float:
+        if not self.duration:
+            return 0.0
+        return min(100.0, sum(self.positions.values()) / self.duration * 100)
+
+    def begin_stage(self, stage: str):
+        """开始新的阶段（例如分段编码之后的拼接），进度重新计算"""
+        self.stage = stage
+        self.positions.clear()
+        self.fps.clear()
+
+    async def report(self, force: bool = False):
+        """推送进度，按 BURN_PROGRESS_INTERVAL 节流"""
+        now = time.monotonic()
+        if not force and now - self._last_report < BURN_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        fps = sum(self.fps.values())
+        await send_message(self.file_id, {
+            "type": "progress",
+            "message": f"{self.stage}: {self.progress:.1f}% ({fps:.0f} fps)",
+            "progress": round(self.progress, 1),
+            "fps": round(fps, 1)
+        })
+
+    async def _stop(self, process: asyncio.subprocess.Process):
+        """先请求 ffmpeg 退出，超时后强制结束"""
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def run(self, cmd: list, slot: int = 0):
+        """执行一个 ffmpeg 命令；stderr 只保留最后几行，进度从标准输出读取"""
+        if self.cancelled:
+            raise BurnCancelled()
+        cmd = [cmd[0], '-nostats', '-progress', 'pipe:1', *cmd[1:]]
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        self.processes.add(process)
+        stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+        async def read_stderr():
+            async for line in process.stderr:
+                stderr_tail.append(line.decode(errors="replace").rstrip())
+
+        async def read_progress():
+            async for line in process.stdout:
+                key, _, value = line.decode(errors="replace").strip().partition("=")
+                try:
+                    # out_time_ms 与 out_time_us 的单位都是微秒
+                    if key in ("out_time_us", "out_time_ms"):
+                        self.positions[slot] = int(value) / 1_000_000
+                    elif key == "fps":
+                        self.fps[slot] = float(value)
+                except ValueError:
+                    continue
+                if key == "progress":
+                    if value == "end":
+                        self.fps.pop(slot, None)
+                    await self.report()
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(read_stderr(), read_progress(), process.wait()),
+                timeout=max(0.0, self.deadline - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(504, f"烧录超时（超过 {BURN_TIMEOUT_SECONDS} 秒）")
+        finally:
+            # 超时、取消或出错时确保 ffmpeg 进程退出
+            await self._stop(process)
+            self.processes.discard(process)
+
+        if self.cancelled:
+            raise BurnCancelled()
+        if process.returncode != 0:
+            raise HTTPException(500, "FFmpeg 执行失败: " + "\n".join(stderr_tail))
+
+    async def cancel(self):
+        """取消任务并结束所有正在运行的 ffmpeg 进程"""
+        self.cancelled = True
+        await asyncio.gather(*[self._stop(process) for process in list(self.processes)])
+
+class BurnJobManager:
+    """按文件记录正在运行的烧录任务"""
+
+    def __init__(self):
+        self.jobs: Dict[str, BurnJob] = {}
+
+    @asynccontextmanager
+    async def start(self, file_id: str, duration: float):
+        if file_id in self.jobs:
+            raise HTTPException(409, "该视频已有正在运行的烧录任务")
+        job = BurnJob(file_id, duration)
+        self.jobs[file_id] = job
+        try:
+            yield job
+            await job.report(force=True)
+        finally:
+            self.jobs.pop(file_id, None)
+
+    def get(self, file_id: str) -> Optional[BurnJob]:
+        return self.jobs.get(file_id)
+
+    async def cancel(self, file_id: str) -> bool:
+        job = self.jobs.get(file_id)
+        if job is None:
+            return False
+        await job.cancel()
+        return True
+
+# 全局烧录任务管理器
+burn_jobs = BurnJobManager()
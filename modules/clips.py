@@ -0,0 +1,168 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from .mp3_stream import decode_mp3_file
+from .silence import to_float
+
+# 中间片段格式：无损 FLAC（16bit 单声道），时长、峰值、RMS 等信息记录在同目录的索引文件中，
+# 读取时无需解码或调用 ffprobe
+CLIP_SUFFIX = ".flac"
+CLIP_PATTERN = re.compile(r"^(\d{4})\.flac$")
+INDEX_NAME = "clips.jsonl"
+# 改用 FLAC 之前生成的 MP3 片段
+LEGACY_CLIP_PATTERN = re.compile(r"^(\d{4})\.mp3$")
+
+def clip_filename(index: int) -> str:
+    """片段文件名 (NNNN.flac)"""
+    return f"{index:04d}{CLIP_SUFFIX}"
+
+def clip_path(audio_dir: Path, index: int) -> Path:
+    """片段文件路径"""
+    return audio_dir / clip_filename(index)
+
+def clip_stats(samples: np.ndarray, sample_rate: int, rms: Optional[float] = None) -> dict:
+    """计算片段的元数据：采样数、采样率、峰值和 RMS（相对满幅）
+    Args:
+        rms: 已知的 RMS（例如裁剪静音时由逐帧能量得到），为 None 时重新计算
+    """
+    data = to_float(samples)
+    if rms is None:
+        rms = float(np.sqrt(np.dot(data, data) / len(data))) if len(data) else 0.0
+    return {
+        "samples": int(len(data)),
+        "sample_rate": int(sample_rate),
+        "peak": round(float(np.max(np.abs(data))), 5) if len(data) else 0.0,
+        "rms": round(rms, 5)
+    }
+
+def file_stamp(path: Path) -> dict:
+    """文件的修改时间和大小，用于判断索引记录是否过期"""
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def append_index_entry(audio_dir: Path, index: int, entry: dict) -> dict:
+    """向索引文件追加一条记录（无需读取已有索引）"""
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    with open(audio_dir / INDEX_NAME, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"index": index, **entry}) + "\n")
+    return entry
+
+class ClipIndex:
+    """AUDIO_DIR/<id>/<lang>/clips.jsonl：记录每个片段的采样数、采样率、峰值、RMS 和文件修改时间/大小
+
+    每写入一个片段追加一行（同一索引以最后一行为准），重新映射时整体重写压缩。
+    读取时只比较文件的修改时间和大小，片段被外部修改后才重新读取并补记。
+    """
+
+    def __init__(self, audio_dir: Path):
+        self.audio_dir = audio_dir
+        self.path = audio_dir / INDEX_NAME
+        self.entries: Dict[int, dict] = {}
+        self.load()
+
+    def load(self):
+        """读取索引，文件不存在时视为空索引，跳过损坏的行"""
+        self.entries = {}
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self.entries[int(entry.pop("index"))] = entry
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+
+    def save(self):
+        """原子重写压缩后的索引"""
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for index, entry in sorted(self.entries.items()):
+                f.write(json.dumps({"index": index, **entry}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def set(self, index: int, entry: dict):
+        """记录片段信息并追加到索引文件"""
+        self.entries[index] = append_index_entry(self.audio_dir, index, entry)
+
+    def get(self, index: int) -> Optional[dict]:
+        """返回片段信息；记录缺失或文件已变化时重新读取片段并补记"""
+        path = clip_path(self.audio_dir, index)
+        if not path.exists():
+            return None
+        stamp = file_stamp(path)
+        entry = self.entries.get(index)
+        if entry is not None and all(entry.get(k) == v for k, v in stamp.items()):
+            return entry
+        samples, sample_rate = read_clip(path)
+        self.set(index, {**clip_stats(samples, sample_rate), **stamp})
+        return self.entries[index]
+
+    def duration(self, index: int) -> Optional[float]:
+        """片段时长（秒）"""
+        entry = self.get(index)
+        if entry is None:
+            return None
+        return entry["samples"] / entry["sample_rate"]
+
+    def remap(self, mapping: Dict[int, int]):
+        """按 {新索引: 旧索引} 重新映射条目并重写索引，未映射的条目被丢弃"""
+        self.entries = {
+            new: self.entries[old] for new, old in mapping.items() if old in self.entries
+        }
+        self.save()
+
+def write_clip(
+    audio_dir: Path, index: int, samples: np.ndarray, sample_rate: int, rms: Optional[float] = None
+) -> Path:
+    """保存片段并更新索引
+    Args:
+        samples: int16 或 [-1, 1] 范围的浮点单声道采样
+        rms: 已知的片段 RMS，见 clip_stats
+    """
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    path = clip_path(audio_dir, index)
+    sf.write(str(path), samples, sample_rate, format="FLAC", subtype="PCM_16")
+
+    append_index_entry(audio_dir, index, {**clip_stats(samples, sample_rate, rms), **file_stamp(path)})
+    return path
+
+def read_clip(path: Path) -> Tuple[np.ndarray, int]:
+    """读取片段，返回 float32 采样和采样率"""
+    samples, sample_rate = sf.read(str(path), dtype="float32", always_2d=False)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples, sample_rate
+
+def migrate_legacy_clips(audio_dir: Path) -> int:
+    """把旧版 NNNN.mp3 片段转换为 FLAC 并写入索引，返回转换的数量
+
+    已有同索引 FLAC 或无法解码的旧片段直接删除，之后按需重新生成。
+    """
+    if not audio_dir.exists():
+        return 0
+    migrated = 0
+    for path in sorted(audio_dir.iterdir()):
+        match = LEGACY_CLIP_PATTERN.match(path.name)
+        if not match:
+            continue
+        index = int(match.group(1))
+        try:
+            if not clip_path(audio_dir, index).exists():
+                samples, sample_rate = decode_mp3_file(path)
+                if len(samples) and sample_rate:
+                    write_clip(audio_dir, index, samples, sample_rate)
+                    migrated += 1
+        except Exception as e:
+            print(f"转换旧版片段失败，将重新生成: {path}: {str(e)}")
+        path.unlink(missing_ok=True)
+    if migrated:
+        print(f"已将 {migrated} 个旧版 MP3 片段转换为 FLAC: {audio_dir}")
+    return migrated
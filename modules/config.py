@@ -13,9 +13,10 @@ MERGED_DIR = Path("merged")
 SUBTITLED_VIDEO_DIR = Path("subtitled_videos")
 TEMP_DIR = Path("temp")
 MODELS_DIR = Path("models")
+MEZZANINE_DIR = Path("mezzanine")
 
 # 创建必要的目录
-DIRS = [UPLOAD_DIR, AUDIO_DIR, SUBTITLE_DIR, STATIC_DIR, MERGED_DIR, SUBTITLED_VIDEO_DIR, TEMP_DIR, MODELS_DIR]
+DIRS = [UPLOAD_DIR, AUDIO_DIR, SUBTITLE_DIR, STATIC_DIR, MERGED_DIR, SUBTITLED_VIDEO_DIR, TEMP_DIR, MODELS_DIR, MEZZANINE_DIR]
 
 # Azure配置
 AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
@@ -23,6 +24,24 @@ AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
 AZURE_TRANSLATOR_KEY = os.getenv("AZURE_TRANSLATOR_KEY")
 AZURE_TRANSLATOR_REGION = os.getenv("AZURE_TRANSLATOR_REGION")
 
+# Azure 语音合成输出为 16kHz 16bit 单声道 PCM
+AZURE_TTS_SAMPLE_RATE = 16000
+# 每个语音保持的预连接合成器数量
+AZURE_SYNTHESIZER_POOL_SIZE = int(os.getenv("AZURE_SYNTHESIZER_POOL_SIZE", "4"))
+# 批量合成：每个 SSML 文档最多包含的字幕条数和字符数，以及字幕之间的停顿
+AZURE_BATCH_MAX_LINES = 50
+AZURE_BATCH_MAX_CHARS = 3000
+AZURE_BATCH_BREAK_MS = 300
+
+# edge-tts 保持的 WebSocket 连接数
+EDGE_TTS_POOL_SIZE = int(os.getenv("EDGE_TTS_POOL_SIZE", "2"))
+# 覆盖 edge-tts 服务地址（例如本地替身服务），为空时使用官方服务
+EDGE_TTS_ENDPOINT = os.getenv("EDGE_TTS_ENDPOINT")
+# 等待 edge-tts 服务下一条消息的超时(秒)，超时后断开重连
+EDGE_TTS_RECEIVE_TIMEOUT = float(os.getenv("EDGE_TTS_RECEIVE_TIMEOUT", "30"))
+# edge-tts 输出格式 (audio-24khz-48kbitrate-mono-mp3) 的采样率
+EDGE_TTS_SAMPLE_RATE = 24000
+
 # 语言配置
 # LANGUAGE_CODE_MAP = {
 #     "en": "en-US",
@@ -54,6 +73,20 @@ LANGUAGE_CODE_MAP = {
     "ru": "ru"
 }
 
+# 字幕/音频流的 ISO 639-2 语言标签
+ISO_639_2_CODES = {
+    "zh": "chi",
+    "en": "eng",
+    "ja": "jpn",
+    "ko": "kor",
+    "fr": "fre",
+    "de": "ger",
+    "es": "spa",
+    "it": "ita",
+    "pt": "por",
+    "ru": "rus"
+}
+
 # 支持的语音列表
 # 定义支持的语音列表
 SUPPORTED_VOICES = {
@@ -132,6 +165,120 @@ SUPPORTED_VOICES = {
     ]
 }
 
+# 本地 TTS 引擎：edge（edge-tts，需要联网，默认）或 coqui（离线神经 TTS，需单独开启）
+LOCAL_TTS_ENGINE = os.getenv("LOCAL_TTS_ENGINE", "edge")
+# 未指定语音时各语言使用的 Coqui TTS 模型，未列出的语言回退到 edge-tts。
+# VITS 模型用 length_scale 调整语速；中文、日语只有 Tacotron2 模型，合成后用 WSOLA 变速
+LOCAL_TTS_MODELS = {
+    "en": "tts_models/en/vctk/vits",
+    "zh-CN": "tts_models/zh-CN/baker/tacotron2-DDC-GST",
+    "zh": "tts_models/zh-CN/baker/tacotron2-DDC-GST",
+    "ja": "tts_models/ja/kokoro/tacotron2-DDC",
+    "fr": "tts_models/fr/css10/vits",
+    "de": "tts_models/de/thorsten/vits",
+    "es": "tts_models/es/css10/vits",
+    "it": "tts_models/it/mai_female/vits",
+    "pt": "tts_models/pt/cv/vits"
+}
+# 未指定语音时多说话人模型使用的说话人
+LOCAL_TTS_SPEAKERS = {
+    "tts_models/en/vctk/vits": "p225"
+}
+# 指定语音时由哪个本地模型和说话人合成（按性别对应），未列出的语音回退到 edge-tts
+LOCAL_TTS_VOICES = {
+    "en-US-JennyNeural": ("tts_models/en/vctk/vits", "p225"),
+    "en-US-AriaNeural": ("tts_models/en/vctk/vits", "p228"),
+    "en-US-AmberNeural": ("tts_models/en/vctk/vits", "p229"),
+    "en-US-SaraNeural": ("tts_models/en/vctk/vits", "p230"),
+    "en-US-GuyNeural": ("tts_models/en/vctk/vits", "p226"),
+    "en-US-DavisNeural": ("tts_models/en/vctk/vits", "p227"),
+    "en-US-JasonNeural": ("tts_models/en/vctk/vits", "p232"),
+    "en-US-TonyNeural": ("tts_models/en/vctk/vits", "p237"),
+    "zh-CN-XiaoxiaoNeural": ("tts_models/zh-CN/baker/tacotron2-DDC-GST", None),
+    "ja-JP-NanamiNeural": ("tts_models/ja/kokoro/tacotron2-DDC", None)
+}
+LOCAL_TTS_WORKERS = int(os.getenv("LOCAL_TTS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+LOCAL_TTS_DEVICE = os.getenv("LOCAL_TTS_DEVICE", "cpu")
+# 工作进程启动时预加载的语言，例如 "en,zh"
+LOCAL_TTS_PRELOAD = [lang for lang in os.getenv("LOCAL_TTS_PRELOAD", "").split(",") if lang]
+LOCAL_TTS_BATCH_SIZE = 8
+LOCAL_TTS_BATCH_WINDOW = 0.05  # 秒
+
+# 整文件生成时同时进行的合成请求数
+SPEECH_CONCURRENCY = int(os.getenv("SPEECH_CONCURRENCY", "4"))
+
+# 合并配音：时间线采样率、并行渲染的窗口长度和进程数，以及语音和背景音轨（乘以用户设置的音量）的增益
+MERGE_SAMPLE_RATE = 24000
+MERGE_WINDOW_SECONDS = 30
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", str(os.cpu_count() or 1)))
+MERGE_SPEECH_GAIN = 1.0
+MERGE_BACKGROUND_GAIN = 0.5
+# 响度归一化（EBU R128）：目标综合响度 (LUFS)、真峰值上限 (dBTP) 和最大提升增益 (dB)
+MERGE_TARGET_LUFS = -16.0
+MERGE_TRUE_PEAK = -1.5
+MERGE_MAX_GAIN_DB = 20.0
+# 片段超出可用时长时，合并时最多压缩到原时长的 1/MAX_STRETCH_RATIO，剩余部分截断
+MAX_STRETCH_RATIO = 1.3
+
+# 分段并行烧录：分段目标时长（在其后的第一个关键帧处切分）和并行 ffmpeg 进程数
+BURN_SEGMENT_SECONDS = 30
+BURN_WORKERS = int(os.getenv("BURN_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# 烧录任务的墙钟超时(秒)和进度推送间隔(秒)
+BURN_TIMEOUT_SECONDS = int(os.getenv("BURN_TIMEOUT_SECONDS", str(4 * 3600)))
+BURN_PROGRESS_INTERVAL = 0.5
+
+# 烧录编码档位：draft 快速审片，standard 默认交付，archive 高质量存档
+# height 为 None 时保持原分辨率；maxrate/bufsize 用于限制 CRF 的峰值码率
+# threads 为单个 ffmpeg 进程的编码线程数：draft 用一半核心，给同时进行的其他任务留出余量；
+# x264 线程过多时码率效率下降，standard 最多 16 线程，archive 最多 8 线程。
+# 分段并行烧录时每个分段进程再限制为 核心数 / 并行进程数，避免多个进程争抢全部核心
+ENCODE_CPU_COUNT = os.cpu_count() or 1
+ENCODE_PROFILES = {
+    "draft": {
+        "preset": "veryfast", "crf": 28, "maxrate": "2M", "bufsize": "4M", "height": 720,
+        "threads": max(1, min(ENCODE_CPU_COUNT // 2, 8)), "tune": "fastdecode", "audio_bitrate": "96k"
+    },
+    "standard": {
+        "preset": "medium", "crf": 23, "maxrate": None, "bufsize": None, "height": None,
+        "threads": min(ENCODE_CPU_COUNT, 16), "tune": None, "audio_bitrate": "128k"
+    },
+    "archive": {
+        "preset": "slow", "crf": 18, "maxrate": None, "bufsize": None, "height": None,
+        "threads": min(ENCODE_CPU_COUNT, 8), "tune": "film", "audio_bitrate": "192k"
+    }
+}
+DEFAULT_ENCODE_PROFILE = "standard"
+
+# ASS 字幕缓存：按 (字幕内容哈希, 样式哈希) 命名，超过数量上限时删除最久未用的文件
+ASS_CACHE_DIR = TEMP_DIR / "ass_cache"
+ASS_CACHE_MAX_FILES = 200
+# 合成音频的窗口缓存：每个文件、每种语言一个子目录，保存已渲染窗口的 PCM 和响度统计（不放在公开的合成目录）
+WINDOW_CACHE_DIR = TEMP_DIR / "window_cache"
+# 合成时背景音轨解码后的 float32 PCM 缓存（不放在公开的音频目录）
+BACKGROUND_CACHE_DIR = TEMP_DIR / "background_cache"
+# 烧录记录（画面指纹、配音和输出文件的修改时间/大小），按输出文件名保存，不放在公开的输出目录
+BURN_RECORD_DIR = TEMP_DIR / "burn_records"
+# 分段烧录缓存：每个输出文件一个子目录，保存分段视频和清单（不放在公开的输出目录）
+SEGMENT_CACHE_DIR = TEMP_DIR / "segment_cache"
+
+# 上传后后台转码为固定短关键帧间隔的中间文件（上传时可单独指定是否转码）
+MEZZANINE_INGEST = os.getenv("MEZZANINE_INGEST", "false").lower() == "true"
+MEZZANINE_KEYFRAME_SECONDS = 2
+MEZZANINE_PRESET = "veryfast"
+MEZZANINE_CRF = 18
+
+# 样式预览：输出高度、默认和最大时长(秒)
+PREVIEW_HEIGHT = 360
+PREVIEW_DEFAULT_SECONDS = 10
+PREVIEW_MAX_SECONDS = 60
+# 预览文件数量上限，超过时删除最久未用的预览
+PREVIEW_MAX_FILES = 100
+
+# 自动匹配语速：可选语速范围，以及片段占可用时长的目标比例
+AUTO_FIT_MIN_SPEED = 1.0
+AUTO_FIT_MAX_SPEED = 2.0
+AUTO_FIT_TARGET_RATIO = 0.95
+
 # Whisper 模型配置
 WHISPER_MODELS = {
     "tiny": {"size": "74 MB", "description": "最小模型，速度最快，精度最低"},
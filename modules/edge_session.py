@@ -0,0 +1,263 @@
+import asyncio
+import ssl
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import aiohttp
+import certifi
+# 服务地址、请求头和 Sec-MS-GEC 令牌随服务端变化，沿用 edge-tts（requirements 中固定版本）；
+# 协议帧的拼装和解析较稳定，在下面单独实现，不依赖 edge_tts.communicate 的内部函数
+from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+from edge_tts.drm import DRM
+
+from .config import EDGE_TTS_ENDPOINT, EDGE_TTS_POOL_SIZE, EDGE_TTS_RECEIVE_TIMEOUT
+
+OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+_SSL_CTX = ssl.create_default_context(cafile=certifi.where())
+
+def connect_id() -> str:
+    """不带连字符的 UUID，用作连接和请求 ID"""
+    return uuid.uuid4().hex
+
+def date_to_string() -> str:
+    """JavaScript 风格的 UTC 时间字符串"""
+    return time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+
+def get_headers_and_data(data: bytes, header_length: int) -> Tuple[Dict[bytes, bytes], bytes]:
+    """拆分消息的头部（到 header_length 为止）和正文"""
+    headers = {}
+    for line in data[:header_length].split(b"\r\n"):
+        key, _, value = line.partition(b":")
+        headers[key] = value
+    return headers, data[header_length + 2:]
+
+def remove_incompatible_characters(text: str) -> str:
+    """把服务端不支持的控制字符（例如 OCR 文本中的垂直制表符）替换为空格"""
+    return "".join(
+        " " if (0 <= ord(char) <= 8) or (11 <= ord(char) <= 12) or (14 <= ord(char) <= 31) else char
+        for char in text
+    )
+
+def ssml_headers_plus_data(request_id: str, timestamp: str, ssml: str) -> str:
+    """SSML 请求消息；时间戳后的 Z 与 Edge 浏览器的实现保持一致"""
+    return (
+        f"X-RequestId:{request_id}\r\n"
+        "Content-Type:application/ssml+xml\r\n"
+        f"X-Timestamp:{timestamp}Z\r\n"
+        "Path:ssml\r\n\r\n"
+        f"{ssml}"
+    )
+
+class EdgeSessionError(Exception):
+    """edge-tts 会话错误"""
+    pass
+
+@dataclass
+class ConnectionStats:
+    """单条连接的吞吐统计"""
+    connection: int
+    requests: int = 0
+    audio_bytes: int = 0
+    busy_seconds: float = 0.0
+    connects: int = 0
+    errors: int = 0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["bytes_per_second"] = round(self.audio_bytes / self.busy_seconds, 1) if self.busy_seconds else 0.0
+        data["busy_seconds"] = round(self.busy_seconds, 3)
+        return data
+
+@dataclass
+class _Request:
+    ssml: str
+    chunks: asyncio.Queue = field(default_factory=asyncio.Queue)
+    delivered: int = 0
+
+def build_edge_ssml(text: str, voice_name: str, rate: str) -> str:
+    """构建 edge-tts 使用的 SSML"""
+    text = escape(remove_incompatible_characters(text))
+    return (
+        "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+        f"<voice name='{voice_name}'>"
+        f"<prosody pitch='+0Hz' rate='{rate}' volume='+0%'>{text}</prosody>"
+        "</voice></speak>"
+    )
+
+class _EdgeConnection:
+    """一条保持打开的 WebSocket 连接，按顺序处理队列中的请求"""
+
+    def __init__(self, index: int, endpoint: Optional[str], receive_timeout: float = EDGE_TTS_RECEIVE_TIMEOUT):
+        self.endpoint = endpoint
+        self.receive_timeout = receive_timeout
+        self.stats = ConnectionStats(connection=index)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.websocket is not None and not self.websocket.closed
+
+    async def connect(self, retried: bool = False):
+        await self.close()
+        self.session = aiohttp.ClientSession(trust_env=True)
+        if self.endpoint:
+            # 本地替身服务，不需要 DRM 参数
+            url, headers, ssl_context = self.endpoint, {}, None
+        else:
+            url = (
+                f"{WSS_URL}&ConnectionId={connect_id()}"
+                f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+                f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}"
+            )
+            headers, ssl_context = DRM.headers_with_muid(WSS_HEADERS), _SSL_CTX
+        try:
+            # 服务端长时间不发消息时 receive 抛出 asyncio.TimeoutError，由连接池断开重连
+            self.websocket = await self.session.ws_connect(
+                url, compress=15, headers=headers, ssl=ssl_context, receive_timeout=self.receive_timeout
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status != 403 or self.endpoint or retried:
+                raise
+            # 时钟偏差导致 Sec-MS-GEC 失效，校正后重试一次
+            DRM.handle_client_response_error(e)
+            return await self.connect(retried=True)
+
+        # 输出格式在连接上只需配置一次
+        await self.websocket.send_str(
+            f"X-Timestamp:{date_to_string()}\r\n"
+            "Content-Type:application/json; charset=utf-8\r\n"
+            "Path:speech.config\r\n\r\n"
+            '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+            '"sentenceBoundaryEnabled":"false","wordBoundaryEnabled":"false"},'
+            f'"outputFormat":"{OUTPUT_FORMAT}"'
+            "}}}}\r\n"
+        )
+        self.stats.connects += 1
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+            self.websocket = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def synthesize(self, request: _Request) -> int:
+        """发送一个 SSML 请求并把音频块推入请求队列，返回音频字节数"""
+        request_id = connect_id()
+        await self.websocket.send_str(ssml_headers_plus_data(request_id, date_to_string(), request.ssml))
+
+        audio_bytes = 0
+        async for message in self.websocket:
+            if message.type == aiohttp.WSMsgType.TEXT:
+                encoded = message.data.encode("utf-8")
+                headers, _ = get_headers_and_data(encoded, encoded.find(b"\r\n\r\n"))
+                if headers.get(b"X-RequestId", request_id.encode()) != request_id.encode():
+                    continue
+                if headers.get(b"Path") == b"turn.end":
+                    if not audio_bytes:
+                        raise EdgeSessionError("未收到音频数据")
+                    return audio_bytes
+            elif message.type == aiohttp.WSMsgType.BINARY:
+                header_length = int.from_bytes(message.data[:2], "big")
+                headers, data = get_headers_and_data(message.data, header_length)
+                if headers.get(b"Path") != b"audio" or not data:
+                    continue
+                if headers.get(b"X-RequestId", request_id.encode()) != request_id.encode():
+                    continue
+                audio_bytes += len(data)
+                request.delivered += 1
+                request.chunks.put_nowait(data)
+            else:
+                break
+        raise ConnectionResetError("WebSocket 连接已断开")
+
+class EdgeSessionManager:
+    """edge-tts 连接池
+
+    保持 size 条预热的 WebSocket 连接，请求进入共享队列，由各连接依次处理，
+    省去每条字幕一次的 TLS/WebSocket 握手。连接断开或超过 receive_timeout 没有
+    收到消息时自动重连，尚未收到音频的请求会在新连接上重试一次。
+    """
+
+    def __init__(
+        self,
+        size: int = EDGE_TTS_POOL_SIZE,
+        endpoint: Optional[str] = EDGE_TTS_ENDPOINT,
+        receive_timeout: float = EDGE_TTS_RECEIVE_TIMEOUT
+    ):
+        self.size = max(1, size)
+        self.endpoint = endpoint
+        self.receive_timeout = receive_timeout
+        self._connections: List[_EdgeConnection] = []
+        self._workers: List[asyncio.Task] = []
+        self._queue: Optional[asyncio.Queue] = None
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        for index in range(self.size):
+            connection = _EdgeConnection(index, self.endpoint, self.receive_timeout)
+            self._connections.append(connection)
+            self._workers.append(asyncio.create_task(self._worker(connection)))
+
+    async def _worker(self, connection: _EdgeConnection):
+        while True:
+            request: _Request = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                for attempt in range(2):
+                    try:
+                        if not connection.connected:
+                            await connection.connect()
+                        audio_bytes = await connection.synthesize(request)
+                        break
+                    except (aiohttp.ClientError, ConnectionError, asyncio.TimeoutError) as e:
+                        connection.stats.errors += 1
+                        await connection.close()
+                        if isinstance(e, asyncio.TimeoutError):
+                            e = asyncio.TimeoutError(f"{connection.receive_timeout}s 内未收到服务端消息")
+                        # 已经推送过音频的请求不能重试，否则会产生重复数据
+                        if attempt == 1 or request.delivered:
+                            raise EdgeSessionError(f"edge-tts 连接失败: {str(e)}")
+                        print(f"edge-tts 连接 {connection.stats.connection} 断开，正在重连: {str(e)}")
+                connection.stats.requests += 1
+                connection.stats.audio_bytes += audio_bytes
+                request.chunks.put_nowait(None)
+            except Exception as e:
+                if not isinstance(e, EdgeSessionError):
+                    connection.stats.errors += 1
+                    await connection.close()
+                request.chunks.put_nowait(e)
+            finally:
+                connection.stats.busy_seconds += time.perf_counter() - started
+                self._queue.task_done()
+
+    async def stream(self, text: str, voice_name: str, rate: str = "+0%") -> AsyncIterator[bytes]:
+        """合成一段文本，按到达顺序产出 MP3 音频块"""
+        self._ensure_started()
+        request = _Request(ssml=build_edge_ssml(text, voice_name, rate))
+        await self._queue.put(request)
+        while True:
+            chunk = await request.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def stats(self) -> List[Dict]:
+        """每条连接的吞吐统计"""
+        return [connection.stats.to_dict() for connection in self._connections]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        for connection in self._connections:
+            await connection.close()
+        self._workers, self._connections = [], []
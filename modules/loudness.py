@@ -0,0 +1,101 @@
+from typing import List, Tuple
+
+import numpy as np
+from scipy.ndimage import minimum_filter1d, uniform_filter1d
+from scipy.signal import lfilter, resample_poly
+
+# ITU-R BS.1770 / EBU R128：响度按 100ms 子块的 K 加权均方能量记录，
+# 400ms 门限块（75% 重叠）由相邻 4 个子块组合，窗口之间可以直接拼接
+SUB_BLOCK_SECONDS = 0.1
+BLOCKS_PER_GATE = 4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+TRUE_PEAK_OVERSAMPLE = 4
+
+def _k_weighting(sample_rate: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """按采样率计算 K 加权的两级双二阶滤波器系数（高架 + 高通）"""
+    # 高架滤波器（模拟头部声学效应）
+    gain, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    a_gain = 10 ** (gain / 40)
+    w0 = 2 * np.pi * fc / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0, sqrt_a = np.cos(w0), np.sqrt(a_gain)
+    shelf_b = np.array([
+        a_gain * ((a_gain + 1) + (a_gain - 1) * cos_w0 + 2 * sqrt_a * alpha),
+        -2 * a_gain * ((a_gain - 1) + (a_gain + 1) * cos_w0),
+        a_gain * ((a_gain + 1) + (a_gain - 1) * cos_w0 - 2 * sqrt_a * alpha)
+    ])
+    shelf_a = np.array([
+        (a_gain + 1) - (a_gain - 1) * cos_w0 + 2 * sqrt_a * alpha,
+        2 * ((a_gain - 1) - (a_gain + 1) * cos_w0),
+        (a_gain + 1) - (a_gain - 1) * cos_w0 - 2 * sqrt_a * alpha
+    ])
+
+    # 高通滤波器（RLB 加权）
+    q, fc = 0.5003270373253953, 38.13547087613982
+    w0 = 2 * np.pi * fc / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    highpass_b = np.array([1.0, -2.0, 1.0])
+    highpass_a = np.array([1 + alpha, -2 * np.cos(w0), 1 - alpha])
+
+    return [
+        (shelf_b / shelf_a[0], shelf_a / shelf_a[0]),
+        (highpass_b, highpass_a / highpass_a[0])
+    ]
+
+def window_stats(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """一个窗口的响度统计：[真峰值, 子块能量...]（float32）
+
+    窗口单独滤波（滤波器初始状态为零），边界处的误差远小于 0.1 LU。
+    """
+    weighted = np.asarray(samples, dtype=np.float64)
+    for b, a in _k_weighting(sample_rate):
+        weighted = lfilter(b, a, weighted)
+    block = int(SUB_BLOCK_SECONDS * sample_rate)
+    count = len(weighted) // block
+    energies = np.einsum(
+        "ij,ij->i",
+        weighted[:count * block].reshape(count, block),
+        weighted[:count * block].reshape(count, block)
+    ) / block
+
+    # 真峰值：4 倍过采样后的采样峰值
+    peak = float(np.max(np.abs(resample_poly(samples, TRUE_PEAK_OVERSAMPLE, 1)))) if len(samples) else 0.0
+    return np.concatenate([[peak], energies]).astype(np.float32)
+
+def integrated_loudness(energies: np.ndarray) -> float:
+    """由整条时间线的子块能量计算综合响度 (LUFS)，全部被门限排除时返回 -inf"""
+    if len(energies) < BLOCKS_PER_GATE:
+        return float("-inf")
+    blocks = np.convolve(energies.astype(np.float64), np.ones(BLOCKS_PER_GATE) / BLOCKS_PER_GATE, mode="valid")
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(blocks)
+
+    gated = blocks[loudness > ABSOLUTE_GATE]
+    if len(gated) == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE
+    gated = blocks[(loudness > ABSOLUTE_GATE) & (loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+def normalization_gain(stats: List[np.ndarray], target: float, max_gain_db: float) -> Tuple[float, float]:
+    """由各窗口统计计算线性增益
+    Returns:
+        (gain, loudness): 线性增益和测得的综合响度
+    """
+    loudness = integrated_loudness(np.concatenate([s[1:] for s in stats]) if stats else np.zeros(0))
+    if not np.isfinite(loudness):
+        return 1.0, loudness
+    gain_db = min(target - loudness, max_gain_db)
+    return 10 ** (gain_db / 20), loudness
+
+def limit(samples: np.ndarray, ceiling: float, sample_rate: int, lookahead_seconds: float = 0.005) -> np.ndarray:
+    """前瞻峰值限幅：增益包络先取邻域最小值再平滑，保证不超过 ceiling 且无硬削波"""
+    magnitude = np.abs(samples)
+    if len(samples) == 0 or magnitude.max() <= ceiling:
+        return samples
+    required = np.minimum(1.0, ceiling / np.maximum(magnitude, 1e-9)).astype(np.float32)
+    lookahead = max(1, int(lookahead_seconds * sample_rate))
+    envelope = minimum_filter1d(required, size=2 * lookahead + 1, mode="nearest")
+    envelope = uniform_filter1d(envelope, size=lookahead, mode="nearest")
+    return samples * np.minimum(envelope, required)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .clips import CLIP_PATTERN, CLIP_SUFFIX, ClipIndex, clip_filename, migrate_legacy_clips
+
+MANIFEST_NAME = "manifest.json"
+
+def clip_fingerprint(
+    text: str,
+    voice_name: Optional[str],
+    speed: float,
+    use_local_tts: bool,
+    auto_fit_duration: Optional[float] = None
+) -> Optional[str]:
+    """计算片段的输入指纹，文本为空时返回 None（不生成片段）
+
+    自动匹配语速时，语速由模型根据可用时长决定，指纹记录可用时长而不是具体语速，
+    这样模型更新后不会导致所有片段被重新生成。
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if auto_fit_duration is None:
+        speed_key = round(float(speed or 1.0), 3)
+    else:
+        speed_key = ["auto", round(float(auto_fit_duration), 2)]
+    payload = json.dumps(
+        [text, voice_name, speed_key, bool(use_local_tts)],
+        ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class ClipManifest:
+    """记录 AUDIO_DIR/<id>/<lang> 下每个片段的输入指纹
+
+    字幕的插入或删除会导致索引整体偏移，因此重新生成时按指纹（内容）
+    而不是按位置匹配已有片段，再把匹配到的文件重命名到新的索引上。
+    """
+
+    def __init__(self, audio_dir: Path):
+        self.audio_dir = audio_dir
+        self.path = audio_dir / MANIFEST_NAME
+        self.clips: Dict[int, str] = {}
+        self.load()
+
+    def load(self):
+        """读取清单，文件不存在或损坏时视为空清单"""
+        self.clips = {}
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.clips = {int(k): v for k, v in data.get("clips", {}).items()}
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            print(f"读取片段清单失败，将全部重新生成: {str(e)}")
+
+    def save(self):
+        """原子写入清单"""
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"clips": {f"{k:04d}": v for k, v in sorted(self.clips.items())}},
+                f, ensure_ascii=False, indent=2
+            )
+        os.replace(tmp_path, self.path)
+
+    def record(self, index: int, fingerprint: str):
+        """记录新生成的片段"""
+        self.clips[index] = fingerprint
+
+    def plan(self, fingerprints: List[Optional[str]]) -> Tuple[Dict[int, int], List[int]]:
+        """根据新的指纹列表规划复用与生成
+        Returns:
+            (reuse, generate): reuse 为 {新索引: 旧索引}，generate 为需要合成的索引列表
+        """
+        # 旧版 MP3 片段先转换为 FLAC，清单中的记录继续有效
+        migrate_legacy_clips(self.audio_dir)
+
+        # 只信任文件仍然存在的记录
+        existing = {
+            index: fp for index, fp in self.clips.items()
+            if (self.audio_dir / clip_filename(index)).exists()
+        }
+        available = defaultdict(list)
+        for index, fp in sorted(existing.items()):
+            available[fp].append(index)
+
+        reuse: Dict[int, int] = {}
+        # 第一轮：位置和内容都未变化
+        for i, fp in enumerate(fingerprints):
+            if fp is not None and existing.get(i) == fp:
+                reuse[i] = i
+                available[fp].remove(i)
+        # 第二轮：内容相同但索引偏移
+        for i, fp in enumerate(fingerprints):
+            if fp is None or i in reuse or not available[fp]:
+                continue
+            reuse[i] = available[fp].pop(0)
+
+        generate = [i for i, fp in enumerate(fingerprints) if fp is not None and i not in reuse]
+        return reuse, generate
+
+    def apply(self, fingerprints: List[Optional[str]], reuse: Dict[int, int]):
+        """把复用的片段移动到新索引，删除孤立片段，同步片段索引，并更新清单（不写盘）"""
+        moves = {new: old for new, old in reuse.items() if new != old}
+        sources = set(reuse.values())
+
+        # 先移到临时文件名，避免链式重命名互相覆盖
+        staged = {}
+        for new, old in moves.items():
+            staged_path = self.audio_dir / f"{old:04d}.remap{CLIP_SUFFIX}"
+            os.replace(self.audio_dir / clip_filename(old), staged_path)
+            staged[new] = staged_path
+
+        # 删除未被复用的旧片段（包括清单中没有记录的文件）
+        for path in self.audio_dir.iterdir():
+            match = CLIP_PATTERN.match(path.name)
+            if match and int(match.group(1)) not in sources:
+                path.unlink(missing_ok=True)
+
+        for new, staged_path in staged.items():
+            os.replace(staged_path, self.audio_dir / clip_filename(new))
+
+        ClipIndex(self.audio_dir).remap(reuse)
+        self.clips = {new: fingerprints[new] for new in reuse}
+        if moves:
+            print(f"按内容重新映射了 {len(moves)} 个语音片段")
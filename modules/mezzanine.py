@@ -0,0 +1,125 @@
+import asyncio
+import glob
+import os
+from pathlib import Path
+from typing import Dict
+
+from .config import (
+    UPLOAD_DIR,
+    MEZZANINE_DIR,
+    MEZZANINE_KEYFRAME_SECONDS,
+    MEZZANINE_PRESET,
+    MEZZANINE_CRF
+)
+from .clips import file_stamp
+from .segments import keyframe_index_path, read_keyframe_index, write_keyframe_index
+
+def upload_path(file_id_without_ext: str) -> Path:
+    """上传的原始视频：上传文件保留原扩展名，有多个时取最近上传的，找不到时返回 .mp4 路径"""
+    uploads = [
+        path for path in UPLOAD_DIR.glob(f"{glob.escape(file_id_without_ext)}.*")
+        if path.stem == file_id_without_ext and path.is_file()
+    ]
+    if not uploads:
+        return UPLOAD_DIR / f"{file_id_without_ext}.mp4"
+    return max(uploads, key=lambda path: path.stat().st_mtime_ns)
+
+def mezzanine_path(file_id_without_ext: str) -> Path:
+    return MEZZANINE_DIR / f"{file_id_without_ext}.mp4"
+
+def source_video(file_id_without_ext: str) -> Path:
+    """下游视频处理使用的源视频：中间文件可用且与当前上传一致时优先使用，否则使用上传文件"""
+    upload = upload_path(file_id_without_ext)
+    mezzanine = mezzanine_path(file_id_without_ext)
+    if mezzanine.exists() and upload.exists():
+        index = read_keyframe_index(mezzanine)
+        if index is not None and index.get('source') == file_stamp(upload):
+            return mezzanine
+    return upload
+
+def build_ingest_command(source: Path, output: Path) -> list:
+    """转码为固定关键帧间隔（关闭场景切换插入）的 mp4，moov 前置"""
+    return [
+        'ffmpeg', '-y',
+        '-i', str(source),
+        '-map', '0:v:0',
+        '-map', '0:a?',
+        '-c:v', 'libx264',
+        '-preset', MEZZANINE_PRESET,
+        '-crf', str(MEZZANINE_CRF),
+        '-force_key_frames', f'expr:gte(t,n_forced*{MEZZANINE_KEYFRAME_SECONDS})',
+        '-sc_threshold', '0',
+        '-c:a', 'aac',
+        '-b:a', '192k',
+        '-movflags', '+faststart',
+        str(output)
+    ]
+
+class MezzanineIngest:
+    """上传后的后台转码任务：生成中间文件和关键帧索引"""
+
+    def __init__(self):
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, file_id: str):
+        """为上传文件启动后台转码；重新上传时取消旧文件的转码"""
+        file_id_without_ext = Path(file_id).stem
+        task = self.tasks.get(file_id_without_ext)
+        if task is not None and not task.done():
+            task.cancel()
+        self.tasks[file_id_without_ext] = asyncio.create_task(self.ingest(file_id_without_ext))
+
+    async def ingest(self, file_id_without_ext: str):
+        source = upload_path(file_id_without_ext)
+        output = mezzanine_path(file_id_without_ext)
+        tmp_path = None
+        try:
+            if not source.exists():
+                print(f"中间文件转码跳过，找不到上传文件: {source}")
+                return
+            source_stamp = file_stamp(source)
+            # 临时文件按上传文件区分，重新上传时新旧任务互不影响
+            tmp_path = output.with_name(f"{file_id_without_ext}.{source_stamp['mtime_ns']}.tmp.mp4")
+            MEZZANINE_DIR.mkdir(parents=True, exist_ok=True)
+            process = await asyncio.create_subprocess_exec(
+                *build_ingest_command(source, tmp_path),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+            if process.returncode != 0:
+                print(f"中间文件转码失败: {stderr.decode(errors='replace')[-2000:]}")
+                return
+
+            # 先作废旧索引再替换文件，索引写完后中间文件才会被使用
+            keyframe_index_path(output).unlink(missing_ok=True)
+            os.replace(tmp_path, output)
+            loop = asyncio.get_running_loop()
+            index = await loop.run_in_executor(
+                None, write_keyframe_index, output, {'source': source_stamp}
+            )
+            print(f"中间文件已生成: {output}，{len(index['keyframes'])} 个关键帧")
+        except Exception as e:
+            print(f"中间文件转码失败: {str(e)}")
+        finally:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            if self.tasks.get(file_id_without_ext) is asyncio.current_task():
+                self.tasks.pop(file_id_without_ext)
+
+    def status(self, file_id: str) -> str:
+        """running 转码中；ready 中间文件可用；none 未转码"""
+        file_id_without_ext = Path(file_id).stem
+        if file_id_without_ext in self.tasks:
+            return "running"
+        if source_video(file_id_without_ext) == mezzanine_path(file_id_without_ext):
+            return "ready"
+        return "none"
+
+# 全局中间文件转码任务
+mezzanine_ingest = MezzanineIngest()
@@ -0,0 +1,285 @@
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from math import gcd
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import av
+import numpy as np
+from scipy.signal import resample_poly
+
+from .clips import read_clip
+from .stretch import time_stretch
+from .config import (
+    MERGE_WINDOW_SECONDS,
+    MERGE_WORKERS,
+    MERGE_TARGET_LUFS,
+    MERGE_TRUE_PEAK,
+    MERGE_MAX_GAIN_DB,
+    BACKGROUND_CACHE_DIR
+)
+from .loudness import limit, normalization_gain, window_stats
+from .window_cache import WindowCache, background_signature, clip_signature
+
+@dataclass
+class MixClip:
+    """时间线上的一个语音片段"""
+    index: int
+    path: Path
+    start: float       # 在时间线上的开始时间(秒)
+    duration: float    # 截取的时长(秒)
+    gain: float = 1.0
+    stretch: float = 1.0  # 变速比例，大于 1 时压缩片段
+
+def clip_span(clip: MixClip, sample_rate: int) -> Tuple[int, int]:
+    """片段在时间线上的采样点范围 [开始, 结束)"""
+    start = int(round(clip.start * sample_rate))
+    return start, start + int(round(clip.duration * sample_rate))
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """多相滤波重采样，采样率相同时原样返回"""
+    if source_rate == target_rate:
+        return samples
+    divisor = gcd(source_rate, target_rate)
+    return resample_poly(samples, target_rate // divisor, source_rate // divisor).astype(np.float32)
+
+def decode_clip(path: Path, sample_rate: int, stretch: float = 1.0) -> np.ndarray:
+    """解码片段，重采样到时间线的采样率，并按需变速"""
+    samples, source_rate = read_clip(path)
+    samples = resample(samples, source_rate, sample_rate)
+    if stretch != 1.0:
+        samples = time_stretch(samples, stretch, sample_rate)
+    return samples
+
+def background_cache(audio_path: Path, sample_rate: int) -> Path:
+    """把背景音轨解码为单声道 float32 原始 PCM 缓存文件（BACKGROUND_CACHE_DIR）
+
+    缓存文件比源文件新时直接复用，不重复解码。
+    """
+    # 旧版本把缓存写在源音轨旁（公开目录）
+    audio_path.with_name(f"{audio_path.stem}.{sample_rate}.f32").unlink(missing_ok=True)
+    cache_path = BACKGROUND_CACHE_DIR / f"{audio_path.stem}.{sample_rate}.f32"
+    if not cache_path.exists() or cache_path.stat().st_mtime < audio_path.stat().st_mtime:
+        BACKGROUND_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".f32.tmp")
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        with av.open(str(audio_path)) as container, open(tmp_path, "wb") as f:
+            for frame in container.decode(audio=0):
+                for out in resampler.resample(frame):
+                    f.write(out.to_ndarray().tobytes())
+            for out in resampler.resample(None):
+                f.write(out.to_ndarray().tobytes())
+        tmp_path.replace(cache_path)
+    return cache_path
+
+def open_background(cache_path: Path) -> np.ndarray:
+    """以内存映射方式打开背景音轨缓存"""
+    if cache_path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(cache_path, dtype=np.float32, mode="r")
+
+def render_window(
+    clips: List[MixClip],
+    start: int,
+    length: int,
+    sample_rate: int,
+    background: Optional[np.ndarray] = None,
+    background_gain: float = 0.0
+) -> np.ndarray:
+    """渲染时间线上 [start, start + length) 的采样（单位：采样点）
+
+    片段按采样点精确放置：开始位置和截取长度都先换算为整数采样点。
+    """
+    end = start + length
+    out = np.zeros(length, dtype=np.float32)
+
+    if background is not None and background_gain:
+        bg = background[start:end]
+        out[:len(bg)] = bg * background_gain
+
+    for clip in clips:
+        clip_start, clip_end = clip_span(clip, sample_rate)
+        if clip_start >= end or clip_end <= start:
+            continue
+        data = decode_clip(clip.path, sample_rate, clip.stretch)[:clip_end - clip_start]
+        lo, hi = max(start, clip_start), min(end, clip_start + len(data))
+        if hi <= lo:
+            continue
+        out[lo - start:hi - start] += data[lo - clip_start:hi - clip_start] * clip.gain
+    return out
+
+def render_batch(
+    clips: List[MixClip],
+    batch_start: int,
+    batch_duration: int,
+    sample_rate: int,
+    background_path: Optional[Path] = None,
+    background_gain: float = 0.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """在工作进程中渲染一个时间窗口（单位：采样点）并测量其响度，背景音轨按路径各自映射
+    Returns:
+        (samples, stats): 窗口采样和响度统计
+    """
+    background = open_background(background_path) if background_path is not None else None
+    samples = render_window(clips, batch_start, batch_duration, sample_rate, background, background_gain)
+    return samples, window_stats(samples, sample_rate)
+
+def split_windows(total_samples: int, window_samples: int) -> List[Tuple[int, int]]:
+    """把时间线划分为固定长度的窗口 [(开始, 长度)]，最后一个窗口可能较短"""
+    return [
+        (start, min(window_samples, total_samples - start))
+        for start in range(0, total_samples, window_samples)
+    ]
+
+def clips_in_window(clips: List[MixClip], start: int, length: int, sample_rate: int) -> List[MixClip]:
+    """与窗口有重叠的片段"""
+    end = start + length
+    spans = ((clip, clip_span(clip, sample_rate)) for clip in clips)
+    return [clip for clip, (clip_start, clip_end) in spans if clip_start < end and clip_end > start]
+
+def render_timeline(
+    clips: List[MixClip],
+    total_samples: int,
+    sample_rate: int,
+    background_path: Optional[Path] = None,
+    background_gain: float = 0.0,
+    window_samples: Optional[int] = None,
+    workers: int = MERGE_WORKERS,
+    cache: Optional[WindowCache] = None
+) -> Iterator[np.ndarray]:
+    """按窗口并行渲染时间线，按顺序产出各窗口的采样
+
+    同时在途的窗口不超过 workers 的两倍，峰值内存只与窗口大小有关，与视频长度无关。
+    窗口边界是整数采样点，跨窗口的片段在两侧按同一绝对位置放置，拼接后与整体渲染完全一致。
+    指定 cache 时只渲染依赖发生变化的窗口，其余窗口直接读取缓存，全部产出后写入缓存清单。
+    """
+    window_samples = window_samples or int(MERGE_WINDOW_SECONDS * sample_rate)
+    windows = split_windows(total_samples, window_samples)
+
+    if cache is None:
+        dirty = set(range(len(windows)))
+    else:
+        clip_windows = {}
+        for clip in clips:
+            clip_start, clip_end = clip_span(clip, sample_rate)
+            covered = list(range(clip_start // window_samples, min(len(windows), -(-clip_end // window_samples))))
+            clip_windows[clip.index] = (clip_signature(clip), covered)
+        dirty = cache.plan(
+            sample_rate, windows, clip_windows,
+            background_signature(background_path, background_gain)
+        )
+        print(f"需要渲染 {len(dirty)}/{len(windows)} 个窗口")
+
+    jobs = iter([
+        (i, (clips_in_window(clips, start, length, sample_rate), start, length, sample_rate, background_path, background_gain))
+        for i, (start, length) in enumerate(windows) if i in dirty
+    ])
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(dirty) > 1 else None
+    pending = {}
+
+    def submit_ahead():
+        # 按窗口顺序提前提交，在途窗口数量有上限
+        limit = workers * 2 if executor else 1
+        while len(pending) < limit:
+            job = next(jobs, None)
+            if job is None:
+                return
+            i, args = job
+            pending[i] = executor.submit(render_batch, *args) if executor else args
+
+    try:
+        for i in range(len(windows)):
+            if i not in dirty:
+                yield cache.read(i)
+                continue
+            submit_ahead()
+            job = pending.pop(i)
+            samples, stats = job.result() if executor else render_batch(*job)
+            if cache is not None:
+                cache.store(i, samples, stats)
+            yield samples
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if cache is not None:
+        cache.save()
+
+def open_encoder(output: Path, sample_rate: int) -> subprocess.Popen:
+    """启动 ffmpeg 编码器，从标准输入读取 float32 单声道 PCM"""
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+        '-codec:a', 'libmp3lame', '-q:a', '2', str(output)
+    ]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def encode(blocks: Iterable[np.ndarray], output: Path, sample_rate: int) -> int:
+    """把采样块依次写入编码器，返回写入的采样数"""
+    encoder = open_encoder(output, sample_rate)
+    written = 0
+    try:
+        for block in blocks:
+            encoder.stdin.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+            written += len(block)
+    except BrokenPipeError:
+        pass
+    finally:
+        encoder.stdin.close()
+        stderr = encoder.stderr.read().decode(errors="replace")
+        encoder.wait()
+    if encoder.returncode != 0:
+        raise RuntimeError(f"音频编码失败: {stderr}")
+    return written
+
+def mix_timeline(
+    clips: List[MixClip],
+    total_duration: float,
+    output: Path,
+    sample_rate: int,
+    cache: WindowCache,
+    background_path: Optional[Path] = None,
+    background_gain: float = 0.0,
+    workers: int = MERGE_WORKERS
+) -> Tuple[float, float]:
+    """分窗口并行混合所有片段和背景音轨，响度归一化后按顺序流式编码
+
+    第一遍渲染变化的窗口并测量响度（其余窗口复用缓存的统计），
+    第二遍对整条时间线施加同一个线性增益并限幅。
+    Returns:
+        (duration, loudness): 输出时长(秒)和归一化前的综合响度 (LUFS)
+    """
+    total_samples = int(round(total_duration * sample_rate))
+    for _ in render_timeline(
+        clips, total_samples, sample_rate,
+        background_path=background_path,
+        background_gain=background_gain,
+        workers=workers,
+        cache=cache
+    ):
+        pass
+
+    window_count = len(cache.state["windows"])
+    stats = []
+    for i in range(window_count):
+        window = cache.read_stats(i)
+        if window is None:
+            window = window_stats(cache.read(i), sample_rate)
+            cache.store_stats(i, window)
+        stats.append(window)
+
+    gain, loudness = normalization_gain(stats, MERGE_TARGET_LUFS, MERGE_MAX_GAIN_DB)
+    ceiling = 10 ** (MERGE_TRUE_PEAK / 20)
+    print(f"综合响度 {loudness:.1f} LUFS，增益 {20 * np.log10(gain):+.1f} dB")
+
+    def normalized():
+        for i in range(window_count):
+            samples = cache.read(i) * np.float32(gain)
+            # 真峰值乘以增益后不超过上限的窗口无需限幅
+            if stats[i][0] * gain > ceiling:
+                samples = limit(samples, ceiling, sample_rate)
+            yield samples
+
+    return encode(normalized(), output, sample_rate) / sample_rate, loudness
@@ -0,0 +1,70 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import av
+import numpy as np
+
+class StreamingMp3Decoder:
+    """边接收边解码 MP3 音频块（进程内，无需 ffmpeg 子进程）
+
+    解码后的采样直接写入预分配的 int16 缓冲区，容量不足时按倍数扩展。
+    """
+
+    def __init__(self, expected_samples: int = 0):
+        self.codec = av.CodecContext.create("mp3", "r")
+        self.buffer = np.empty(max(expected_samples, 4096), dtype=np.int16)
+        self.length = 0
+        self.sample_rate: Optional[int] = None
+
+    def _append(self, samples: np.ndarray):
+        end = self.length + len(samples)
+        if end > len(self.buffer):
+            grown = np.empty(max(end, len(self.buffer) * 2), dtype=np.int16)
+            grown[:self.length] = self.buffer[:self.length]
+            self.buffer = grown
+        self.buffer[self.length:end] = samples
+        self.length = end
+
+    def _decode(self, packet):
+        for frame in self.codec.decode(packet):
+            self._add_frame(frame)
+
+    def _add_frame(self, frame):
+        """把一帧解码结果混成单声道追加到缓冲区"""
+        self.sample_rate = frame.sample_rate
+        data = frame.to_ndarray()
+        channels = len(frame.layout.channels)
+        # 平面格式为 (声道, 采样)，交错格式为 (1, 采样*声道)，统一混成单声道
+        if not frame.format.is_planar:
+            data = data.reshape(-1, channels).T
+        # 按解码帧的采样格式换算到 int16 范围，均值在 float32 中计算
+        if np.issubdtype(data.dtype, np.floating):
+            scale = 32767.0
+        else:
+            scale = 32767.0 / np.iinfo(data.dtype).max
+        mono = data.astype(np.float32).mean(axis=0) if channels > 1 else data[0].astype(np.float32)
+        mono = np.clip(np.round(mono * scale), -32768, 32767)
+        self._append(mono.astype(np.int16))
+
+    def feed(self, chunk: bytes):
+        """送入一段 MP3 数据，解码其中完整的帧"""
+        for packet in self.codec.parse(chunk):
+            self._decode(packet)
+
+    def finish(self) -> np.ndarray:
+        """刷新解析器和解码器，返回全部 int16 采样（缓冲区视图，不复制）"""
+        for packet in self.codec.parse(None):
+            self._decode(packet)
+        self._decode(None)
+        return self.buffer[:self.length]
+
+def decode_mp3_file(path: Path) -> Tuple[np.ndarray, Optional[int]]:
+    """解码完整的 MP3 文件（经解复用器读取，可处理文件开头的 ID3 标签）
+    Returns:
+        (samples, sample_rate): int16 单声道采样和采样率
+    """
+    decoder = StreamingMp3Decoder()
+    with av.open(str(path)) as container:
+        for frame in container.decode(audio=0):
+            decoder._add_frame(frame)
+    return decoder.buffer[:decoder.length], decoder.sample_rate
@@ -0,0 +1,103 @@
+import json
+import os
+import unicodedata
+from typing import Dict, Optional
+
+from .config import (
+    MODELS_DIR,
+    AUTO_FIT_MIN_SPEED,
+    AUTO_FIT_MAX_SPEED,
+    AUTO_FIT_TARGET_RATIO
+)
+
+RATE_MODEL_PATH = MODELS_DIR / "speaking_rates.json"
+
+def count_chars(text: str) -> int:
+    """统计参与发音的字符数（忽略空白和标点）"""
+    return sum(
+        1 for ch in text
+        if not ch.isspace() and not unicodedata.category(ch).startswith("P")
+    )
+
+def voice_key(voice_name: Optional[str], target_language: str, use_local_tts: bool) -> str:
+    """语速模型的键：引擎 + 语音（未指定语音时按语言区分默认语音）"""
+    engine = "local" if use_local_tts else "azure"
+    return f"{engine}:{voice_name or target_language}"
+
+class SpeakingRateModel:
+    """按语音学习的语速模型（每秒字符数，归一化到 1.0 倍速）
+
+    每生成一个片段就用其实际时长更新一次内存中的指数滑动平均，
+    从而在合成前预测时长，并直接选出能放进可用时长的语速。
+    更新不立即写盘，由调用方在一批片段生成完后调用 flush 写入一次。
+    """
+
+    def __init__(self, path=RATE_MODEL_PATH, smoothing: float = 0.2):
+        self.path = path
+        self.smoothing = smoothing
+        self.voices: Dict[str, dict] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """读取模型，文件不存在或损坏时从空模型开始"""
+        self.voices = {}
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.voices = json.load(f)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"读取语速模型失败: {str(e)}")
+
+    def save(self):
+        """原子写入模型（先写临时文件再替换）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.voices, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def flush(self):
+        """有未写盘的更新时保存模型"""
+        if not self.dirty:
+            return
+        try:
+            self.save()
+        except OSError as e:
+            print(f"保存语速模型失败: {str(e)}")
+
+    def observe(self, key: str, text: str, speed: float, duration: float):
+        """用一个已生成片段更新模型（只更新内存，见 flush）"""
+        chars = count_chars(text)
+        if chars == 0 or duration <= 0:
+            return
+        # 时长近似与语速成反比，先换算回 1.0 倍速下的每秒字符数
+        cps = chars / (duration * speed)
+        entry = self.voices.get(key)
+        if entry is None:
+            self.voices[key] = {"cps": cps, "samples": 1}
+        else:
+            entry["cps"] += self.smoothing * (cps - entry["cps"])
+            entry["samples"] += 1
+        self.dirty = True
+
+    def predict(self, key: str, text: str, speed: float = 1.0) -> Optional[float]:
+        """预测给定语速下的时长（秒），没有该语音的数据时返回 None"""
+        entry = self.voices.get(key)
+        chars = count_chars(text)
+        if entry is None or chars == 0:
+            return None
+        return chars / (entry["cps"] * speed)
+
+    def fit_speed(self, key: str, text: str, available_duration: float, default: float = 1.0) -> float:
+        """选出让片段放进可用时长的语速；无法预测时返回 default"""
+        predicted = self.predict(key, text)
+        if predicted is None or available_duration <= 0:
+            return default
+        speed = predicted / (available_duration * AUTO_FIT_TARGET_RATIO)
+        return round(min(AUTO_FIT_MAX_SPEED, max(AUTO_FIT_MIN_SPEED, speed)), 2)
+
+# 全局语速模型
+rate_model = SpeakingRateModel()
@@ -0,0 +1,96 @@
+import json
+import os
+from math import floor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import av
+
+from .clips import file_stamp
+
+def probe_duration(video_path: Path) -> float:
+    """从容器头读取视频时长(秒)"""
+    with av.open(str(video_path)) as container:
+        if container.duration is not None:
+            return container.duration / av.time_base
+        stream = container.streams.video[0]
+        return float(stream.duration * stream.time_base) if stream.duration is not None else 0.0
+
+def keyframe_index_path(video_path: Path) -> Path:
+    """视频旁的关键帧索引文件"""
+    return video_path.with_suffix('.keyframes.json')
+
+def read_keyframe_index(video_path: Path) -> Optional[dict]:
+    """读取关键帧索引，索引不存在、损坏或与视频不匹配时返回 None"""
+    path = keyframe_index_path(video_path)
+    if not path.exists() or not video_path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"读取关键帧索引失败: {str(e)}")
+        return None
+    if index.get('video') != file_stamp(video_path):
+        return None
+    return index
+
+def write_keyframe_index(video_path: Path, extra: Optional[dict] = None) -> dict:
+    """解复用一次视频，把关键帧时间和时长写入索引文件"""
+    keyframes, duration = demux_keyframes(video_path)
+    index = {
+        **(extra or {}),
+        'video': file_stamp(video_path),
+        'keyframes': keyframes,
+        'duration': duration
+    }
+    path = keyframe_index_path(video_path)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+    return index
+
+def probe_keyframes(video_path: Path) -> Tuple[List[float], float]:
+    """视频的关键帧时间，有匹配的关键帧索引时直接读取索引
+    Returns:
+        (keyframes, duration): 相对视频开头的关键帧时间(秒)和视频时长(秒)
+    """
+    index = read_keyframe_index(video_path)
+    if index is not None:
+        return index['keyframes'], index['duration']
+    return demux_keyframes(video_path)
+
+def demux_keyframes(video_path: Path) -> Tuple[List[float], float]:
+    """读取视频流所有关键帧的时间（只解复用，不解码）"""
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        time_base = stream.time_base
+        start = float(stream.start_time * time_base) if stream.start_time is not None else 0.0
+        keyframes = [
+            float(packet.pts * time_base) - start
+            for packet in container.demux(stream)
+            if packet.is_keyframe and packet.pts is not None
+        ]
+        if container.duration is not None:
+            duration = container.duration / av.time_base
+        elif stream.duration is not None:
+            duration = float(stream.duration * time_base)
+        else:
+            duration = max(keyframes, default=0.0)
+    return sorted(keyframes), duration
+
+def plan_segments(keyframes: List[float], duration: float, segment_seconds: float) -> List[Tuple[float, float]]:
+    """在关键帧处把视频切分为约 segment_seconds 长的分段 [(开始, 结束)]
+
+    每个分段从 k * segment_seconds 之后的第一个关键帧开始，
+    所以字幕或样式变化不会改变分段边界，同一视频多次烧录的分段保持一致。
+    """
+    bounds = [0.0]
+    next_target = segment_seconds
+    for time in keyframes:
+        if time >= next_target and time < duration:
+            bounds.append(time)
+            next_target = (floor(time / segment_seconds) + 1) * segment_seconds
+    bounds.append(duration)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+FRAME_SECONDS = 0.02  # 20ms 帧
+
+@dataclass
+class TrimResult:
+    """静音裁剪结果
+
+    envelope 是裁剪后片段逐帧的 RMS 能量（帧与 samples 对齐），
+    保存片段时由它直接得到片段 RMS，无需再次遍历采样。
+    """
+    samples: np.ndarray
+    sample_rate: int
+    start: int
+    end: int
+    envelope: np.ndarray
+    frame_length: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def rms(self) -> float:
+        """由逐帧能量得到整个片段的 RMS（最后一帧可能不足 frame_length）"""
+        if len(self.envelope) == 0 or len(self.samples) == 0:
+            return 0.0
+        energy = self.envelope.astype(np.float64) ** 2
+        tail = len(self.samples) - (len(self.envelope) - 1) * self.frame_length
+        total = energy[:-1].sum() * self.frame_length + energy[-1] * tail
+        return float(np.sqrt(total / len(self.samples)))
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """把整数 PCM 转换为 [-1, 1] 范围的 float32，浮点输入原样返回"""
+    if np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    return samples.astype(np.float32, copy=False)
+
+def frame_energy(samples: np.ndarray, sample_rate: int, frame_seconds: float = FRAME_SECONDS) -> Tuple[np.ndarray, int]:
+    """一次性计算逐帧 RMS 能量
+    Returns:
+        (envelope, frame_length): 最后不足一帧的部分单独计为一帧
+    """
+    data = to_float(samples)
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    full_frames = len(data) // frame_length
+
+    # reshape 只改变视图，不复制数据
+    frames = data[:full_frames * frame_length].reshape(full_frames, frame_length)
+    energy = np.einsum("ij,ij->i", frames, frames) / frame_length
+
+    tail = data[full_frames * frame_length:]
+    if len(tail):
+        energy = np.append(energy, np.dot(tail, tail) / len(tail))
+    return np.sqrt(energy, dtype=np.float32), frame_length
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    threshold: float = 0.01,
+    min_silence_duration: float = 0.1,
+    padding: float = FRAME_SECONDS
+) -> TrimResult:
+    """裁剪片段开头和末尾的静音
+
+    参数:
+    - threshold: RMS 阈值（相对满幅），低于此值视为静音
+    - min_silence_duration: 短于此时长的首尾静音保留不裁
+    - padding: 在语音前后保留的过渡时长(秒)
+    """
+    envelope, frame_length = frame_energy(samples, sample_rate)
+    voiced = np.flatnonzero(envelope > threshold)
+    if len(voiced) == 0:
+        # 全部为静音时不裁剪，交由调用方判断
+        return TrimResult(samples, sample_rate, 0, len(samples), envelope, frame_length)
+
+    min_silence_frames = int(np.ceil(min_silence_duration * sample_rate / frame_length))
+    pad_frames = int(np.ceil(padding * sample_rate / frame_length))
+
+    first_frame, last_frame = voiced[0], voiced[-1] + 1
+    if first_frame >= min_silence_frames:
+        first_frame = max(0, first_frame - pad_frames)
+    else:
+        first_frame = 0
+    if len(envelope) - last_frame >= min_silence_frames:
+        last_frame = min(len(envelope), last_frame + pad_frames)
+    else:
+        last_frame = len(envelope)
+
+    start = first_frame * frame_length
+    end = min(len(samples), last_frame * frame_length)
+    return TrimResult(
+        samples[start:end], sample_rate, start, end,
+        envelope[first_frame:last_frame], frame_length
+    )
@@ -7,6 +7,12 @@ import re
 from .config import (
     AZURE_SPEECH_KEY, 
     AZURE_SPEECH_REGION,
+    AZURE_TTS_SAMPLE_RATE,
+    AZURE_SYNTHESIZER_POOL_SIZE,
+    AZURE_BATCH_MAX_LINES,
+    AZURE_BATCH_MAX_CHARS,
+    AZURE_BATCH_BREAK_MS,
+    SPEECH_CONCURRENCY,
     TEMP_DIR,
     AUDIO_DIR,
     SUPPORTED_VOICES,
@@ -15,6 +21,12 @@ from .config import (
 from .websocket import send_message
 import json
 from .tts import tts as local_tts
+from .manifest import ClipManifest, clip_fingerprint
+from .clips import ClipIndex, clip_filename, write_clip
+from .silence import trim_silence
+from .rate_model import rate_model, voice_key
+from .synthesizer_pool import PooledSynthesizer, SynthesizerPool
+from xml.sax.saxutils import escape
 from pydub import AudioSegment
 import io
 
@@ -23,149 +35,177 @@ import numpy as np
 from scipy.io import wavfile
 import soundfile as sf
 
-def trim_silence_end(audio_data, sample_rate, threshold=0.01, min_silence_duration=0.1):
-    """
-    裁剪音频末尾的静音部分
-    
-    参数:
-    - threshold: 音量阈值，低于此值视为静音
-    - min_silence_duration: 最小静音持续时间(秒)
-    """
-    # 计算音频的RMS能量
-    frame_length = int(sample_rate * 0.02)  # 20ms 帧
-    energy = np.array([
-        np.sqrt(np.mean(frame**2))
-        for frame in np.array_split(audio_data, len(audio_data) // frame_length)
-    ])
-    
-    # 从后向前查找第一个非静音帧
-    min_silence_frames = int(min_silence_duration * sample_rate / frame_length)
-    silence_count = 0
-    end_frame = len(energy) - 1
-    
-    for i in range(len(energy) - 1, -1, -1):
-        if energy[i] > threshold:
-            end_frame = i + 1  # 保留一帧过渡
+def create_azure_synthesizer(voice_name: str) -> PooledSynthesizer:
+    """创建输出到内存 PCM 的 Azure 合成器，并预先打开连接"""
+    speech_config = speechsdk.SpeechConfig(
+        subscription=AZURE_SPEECH_KEY, 
+        region=AZURE_SPEECH_REGION
+    )
+    speech_config.speech_synthesis_voice_name = voice_name
+    speech_config.set_speech_synthesis_output_format(
+        speechsdk.SpeechSynthesisOutputFormat.Raw16Khz16BitMonoPcm
+    )
+
+    # audio_config=None 时音频只保存在 result.audio_data 中，不写文件也不播放
+    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+    connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+    connection.open(True)
+    return PooledSynthesizer(voice_name=voice_name, synthesizer=synthesizer, connection=connection)
+
+# 全局合成器池
+synthesizer_pool = SynthesizerPool(create_azure_synthesizer, AZURE_SYNTHESIZER_POOL_SIZE)
+
+def build_ssml(voice_name: str, content: str, speed: float = 1.0) -> str:
+    """构建带语速的 SSML 文档，content 为已转义的 SSML 片段"""
+    # 将我们的speed参数(0.5-2.0)转换为百分比: 1.0->+0%, 2.0->+100%, 0.5->-50%
+    rate = f"{int(round((speed - 1) * 100)):+d}%"
+    language = "-".join(voice_name.split("-")[:2])
+    return (
+        f"<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='{language}'>"
+        f"<voice name='{voice_name}'><prosody rate='{rate}'>{content}</prosody></voice>"
+        f"</speak>"
+    )
+
+def validate_voice(voice_name: str) -> str:
+    """验证语音名称，返回对应的语言代码"""
+    language = voice_name.split("-")[0] + "-" + voice_name.split("-")[1]
+    if language not in SUPPORTED_VOICES:
+        raise HTTPException(400, f"不支持的语言: {language}")
+
+    voice_exists = False
+    for voice in SUPPORTED_VOICES[language]:
+        if voice["name"] == voice_name:
+            voice_exists = True
             break
-        silence_count += 1
-        if silence_count < min_silence_frames:
-            end_frame = i
-    
-    # 计算实际采样点位置
-    end_sample = min(len(audio_data), (end_frame + 1) * frame_length)
-    return audio_data[:end_sample]
+    if not voice_exists:
+        raise HTTPException(400, f"指定的语音 {voice_name} 不存在")
+    return language
+
+async def synthesize_azure(voice_name: str, ssml: str, bookmarks: list = None) -> np.ndarray:
+    """使用池中的合成器合成 SSML，返回 int16 PCM；传入 bookmarks 时收集 (书签名, 音频偏移) 列表"""
+    # 从池中借用预连接的合成器，直接合成到内存中的 PCM
+    async with synthesizer_pool.session(voice_name) as session:
+        synthesizer = session.synthesizer
+        if bookmarks is not None:
+            synthesizer.bookmark_reached.connect(
+                lambda evt: bookmarks.append((evt.text, evt.audio_offset))
+            )
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: synthesizer.speak_ssml_async(ssml).get())
+        finally:
+            if bookmarks is not None:
+                synthesizer.bookmark_reached.disconnect_all()
+
+        if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+            error_details = result.cancellation_details.error_details \
+                if result.reason == speechsdk.ResultReason.Canceled else result.reason
+            raise Exception(f"生成语音失败: {error_details}")
+
+    return np.frombuffer(result.audio_data, dtype=np.int16)
+
+def save_azure_clip(audio_dir: Path, index: int, samples: np.ndarray) -> float:
+    """裁剪静音并保存 Azure 合成的 int16 PCM 片段（无损，不重新编码为 MP3），返回片段时长"""
+    try:
+        # 裁剪首尾静音
+        trimmed = trim_silence(samples, AZURE_TTS_SAMPLE_RATE)
+        write_clip(audio_dir, index, trimmed.samples, AZURE_TTS_SAMPLE_RATE, rms=trimmed.rms)
+        return trimmed.duration
+    except Exception as e:
+        raise HTTPException(500, f"音频保存失败: {str(e)}")
 
 async def generate_speech(file_id: str, subtitle_index: int, text: str, voice_name: str = "zh-CN-XiaoxiaoNeural", use_local_tts: bool = False, target_language: str = "en-US", speed: float = 1.0):
     try:
         if use_local_tts:
             # 使用本地 TTS
-            audio_data = await local_tts.generate_speech(text, target_language, voice_name, speed)
-            
-            # 裁剪末尾静音
-            trimmed_audio = trim_silence_end(audio_data, 22050)  # 22050是采样率
+            audio_data, sample_rate = await local_tts.generate_speech(text, target_language, voice_name, speed)
             
-            # 准备音频文件路径
-            audio_dir = AUDIO_DIR / file_id / target_language
-            audio_dir.mkdir(parents=True, exist_ok=True)
-            
-            audio_file = audio_dir / f"{subtitle_index:04d}.mp3"
+            # 按实际采样率裁剪首尾静音
+            trimmed = trim_silence(audio_data, sample_rate)
             
             # 保存音频
-            sf.write(str(audio_file), trimmed_audio, 22050)
+            write_clip(AUDIO_DIR / file_id / target_language, subtitle_index, trimmed.samples, sample_rate, rms=trimmed.rms)
+
+            # 用实际时长更新语速模型
+            rate_model.observe(voice_key(voice_name, target_language, True), text, speed, trimmed.duration)
             
-            return {"success": True, "message": "本地TTS生成成功"}
+            return {"success": True, "message": "本地TTS生成成功", "audio_duration": trimmed.duration}
         else:
             # 验证语音名称
-            language = voice_name.split("-")[0] + "-" + voice_name.split("-")[1]
-            if language not in SUPPORTED_VOICES:
-                raise HTTPException(400, f"不支持的语言: {language}")
-            
-            voice_exists = False
-            for voice in SUPPORTED_VOICES[language]:
-                if voice["name"] == voice_name:
-                    voice_exists = True
-                    break
-            if not voice_exists:
-                raise HTTPException(400, f"指定的语音 {voice_name} 不存在")
-            
-            # 配置语音合成
-            speech_config = speechsdk.SpeechConfig(
-                subscription=AZURE_SPEECH_KEY, 
-                region=AZURE_SPEECH_REGION
-            )
-            speech_config.speech_synthesis_voice_name = voice_name
-            
-            # 准备音频文件路径
-            audio_dir = AUDIO_DIR / file_id / language
-            audio_dir.mkdir(parents=True, exist_ok=True)
-            
-            temp_wav_file = audio_dir / f"{subtitle_index:04d}_temp.wav"
-            audio_file = audio_dir / f"{subtitle_index:04d}.mp3"
-            
-            # 设置语速
-            # Azure的语速范围是-100到200，0是正常速度
-            # 将我们的speed参数(0.5-2.0)转换为Azure的范围
-            rate_value = int((speed - 1) * 100)  # 1.0->0, 2.0->100, 0.5->-50
-            speech_config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3)
-            speech_config.speech_synthesis_rate = rate_value
-
-            # 配置音频输出
-            audio_config = speechsdk.audio.AudioOutputConfig(filename=str(temp_wav_file))
-
-            # 创建语音合成器
-            speech_synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config, 
-                audio_config=audio_config
-            )
-            
-            # 生成语音
-            result = speech_synthesizer.speak_text_async(text).get()
-            
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                try:
-                    # # 确保WAV文件已经生成
-                    # if not temp_wav_file.exists():
-                    #     raise Exception("WAV文件未生成")
-
-                    # # 使用 pydub 转换为 MP3
-                    # audio = AudioSegment.from_wav(str(temp_wav_file))
-                    # audio.export(str(audio_file), format='mp3', parameters=["-q:a", "4"])
-                    
-                    # 确保WAV文件已经生成
-                    if not temp_wav_file.exists():
-                        raise Exception("WAV文件未生成")
-
-                    # 使用 pydub 加载 WAV 文件
-                    audio = AudioSegment.from_wav(str(temp_wav_file))
-                    samples = np.array(audio.get_array_of_samples())
-                    sample_rate = audio.frame_rate
-
-                    # 裁剪静音
-                    trimmed_samples = trim_silence_end(samples, sample_rate)
-
-                    # 转换为 MP3
-                    trimmed_audio = AudioSegment(
-                        trimmed_samples.tobytes(), 
-                        frame_rate=sample_rate,
-                        sample_width=2,  # 16-bit
-                        channels=1  # mono
-                    )
-                    trimmed_audio.export(str(audio_file), format='mp3', parameters=["-q:a", "4"])
-                    # 删除临时文件
-                    temp_wav_file.unlink(missing_ok=True)
-                    
-                    return {"success": True, "message": "语音生成成功"}
-                except Exception as e:
-                    raise HTTPException(500, f"音频转换失败: {str(e)}")
-            else:
-                error_details = result.properties.get(
-                    speechsdk.PropertyId.SpeechServiceResponse_JsonErrorDetails
-                )
-                raise HTTPException(500, f"生成语音失败: {error_details}")
+            language = validate_voice(voice_name)
+
+            # 语速通过 SSML prosody 设置
+            samples = await synthesize_azure(voice_name, build_ssml(voice_name, escape(text), speed))
+            audio_duration = save_azure_clip(AUDIO_DIR / file_id / language, subtitle_index, samples)
+
+            # 用实际时长更新语速模型
+            rate_model.observe(voice_key(voice_name, target_language, False), text, speed, audio_duration)
+
+            return {"success": True, "message": "语音生成成功", "audio_duration": audio_duration}
             
     except Exception as e:
         raise HTTPException(500, f"生成语音失败: {str(e)}")
 
+async def generate_speech_batch(file_id: str, items: list, voice_name: str, target_language: str) -> list:
+    """把同一语音的多条字幕打包进一个 SSML 文档合成一次，再按书签位置切分为逐条片段
+    Args:
+        items: [(字幕索引, 文本, 语速), ...]
+    Returns:
+        list: 成功生成的字幕索引
+    """
+    language = validate_voice(voice_name)
+    audio_dir = AUDIO_DIR / file_id / language
+
+    # 每条字幕前放一个书签并单独设置语速，字幕之间插入短停顿，切分后由静音裁剪去掉
+    content = "".join(
+        f"<bookmark mark='{index}'/>"
+        f"<prosody rate='{int(round((speed - 1) * 100)):+d}%'>{escape(text)}</prosody>"
+        f"<break time='{AZURE_BATCH_BREAK_MS}ms'/>"
+        for index, text, speed in items
+    )
+    bookmarks = []
+    samples = await synthesize_azure(voice_name, build_ssml(voice_name, content), bookmarks)
+
+    # 书签偏移以 100 纳秒为单位
+    offsets = {
+        int(mark): int(round(offset / 10_000_000 * AZURE_TTS_SAMPLE_RATE))
+        for mark, offset in bookmarks
+    }
+    if any(index not in offsets for index, _, _ in items):
+        raise Exception(f"书签数量不匹配: 期望 {len(items)} 个，收到 {len(offsets)} 个")
+
+    key = voice_key(voice_name, target_language, False)
+    boundaries = [offsets[index] for index, _, _ in items] + [len(samples)]
+    for n, (index, text, speed) in enumerate(items):
+        audio_duration = save_azure_clip(audio_dir, index, samples[boundaries[n]:boundaries[n + 1]])
+        rate_model.observe(key, text, speed, audio_duration)
+
+    print(f"批量合成 {len(items)} 条字幕，音频时长 {len(samples) / AZURE_TTS_SAMPLE_RATE:.1f}s")
+    return [index for index, _, _ in items]
+
+def get_available_duration(subtitles: list, index: int) -> tuple:
+    """返回 (与下一条字幕的间隔, 可用总时长)，可用总时长 = 字幕时长 + 间隔时长"""
+    subtitle = subtitles[index]
+    gap_duration = 0
+    if index < len(subtitles) - 1:
+        next_subtitle = subtitles[index + 1]
+        gap_duration = next_subtitle["start"] - (subtitle["start"] + subtitle["duration"])
+    return gap_duration, subtitle["duration"] + gap_duration
+
+def split_speech_batches(indices: list, subtitles: list) -> list:
+    """把待生成的字幕索引按条数和字符数上限分组"""
+    batches, current, chars = [], [], 0
+    for i in indices:
+        length = len(subtitles[i]['text'])
+        if current and (len(current) >= AZURE_BATCH_MAX_LINES or chars + length > AZURE_BATCH_MAX_CHARS):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(i)
+        chars += length
+    if current:
+        batches.append(current)
+    return batches
+
 async def recognize_speech(file_id: str, audio_path: Path, language: str = "zh-CN", max_retries: int = 3):
     """语音识别函数，添加重试机制"""
     for attempt in range(max_retries):
@@ -294,9 +334,15 @@ async def generate_speech_for_file(
     target_language: str = None,
     voice_name: str = None,
     speed: float = 1.0,
-    use_local_tts: bool = False
+    use_local_tts: bool = False,
+    batch: bool = False,
+    auto_fit: bool = False
 ):
-    """为整个文件生成语音"""
+    """为整个文件生成语音
+    Args:
+        batch: 使用 Azure 时，把连续的多条字幕打包进一个 SSML 请求
+        auto_fit: 按语速模型为每条字幕选择能放进可用时长的语速，忽略 speed
+    """
     try:
         # 读取字幕文件
         file_id_without_ext = Path(file_id).stem
@@ -310,70 +356,128 @@ async def generate_speech_for_file(
         with open(subtitle_file, 'r', encoding='utf-8') as f:
             subtitles = json.load(f)
 
+        # 按内容指纹规划：只合成新增或变化的字幕，复用并重映射其余片段
+        audio_dir = AUDIO_DIR / file_id / target_language
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        manifest = ClipManifest(audio_dir)
+        available_durations = [get_available_duration(subtitles, i)[1] for i in range(len(subtitles))]
+        fingerprints = [
+            clip_fingerprint(
+                subtitle.get('text', ''), voice_name, speed, use_local_tts,
+                auto_fit_duration=available_durations[i] if auto_fit else None
+            )
+            for i, subtitle in enumerate(subtitles)
+        ]
+        reuse, to_generate = manifest.plan(fingerprints)
+        manifest.apply(fingerprints, reuse)
+        manifest.save()
+        print(f"复用 {len(reuse)} 个语音片段，需要生成 {len(to_generate)} 个")
+
+        # Azure 批量模式：多条字幕合成一次；其余情况按 SPEECH_CONCURRENCY 条一组并发合成，
+        # 本地引擎会把同组请求合并成批，Azure 则分给池中的多个合成器
+        batched = batch and not use_local_tts
+        if batched:
+            groups = split_speech_batches(to_generate, subtitles)
+        else:
+            groups = [
+                to_generate[start:start + SPEECH_CONCURRENCY]
+                for start in range(0, len(to_generate), SPEECH_CONCURRENCY)
+            ]
+
+        # 自动匹配时，在合成前按模型预测的时长选择语速
+        key = voice_key(voice_name, target_language, use_local_tts)
+
+        def speed_for(i: int) -> float:
+            if not auto_fit:
+                return speed
+            return rate_model.fit_speed(key, subtitles[i]['text'], available_durations[i], default=speed or 1.0)
+
+        total_count = len(to_generate)
+        done_count = 0
+        try:
+            for group in groups:
+                done_count += len(group)
+
+                # 发送进度消息
+                progress = done_count / total_count * 100
+                await send_message(file_id, {
+                    "type": "progress",
+                    "message": f"正在生成第 {done_count}/{total_count} 个语音",
+                    "progress": progress
+                })
+
+                if batched and len(group) > 1:
+                    try:
+                        generated = await generate_speech_batch(
+                            file_id,
+                            [(i, subtitles[i]['text'], speed_for(i)) for i in group],
+                            voice_name,
+                            target_language
+                        )
+                        for i in generated:
+                            manifest.record(i, fingerprints[i])
+                        continue
+                    except Exception as e:
+                        print(f"批量合成失败，改为逐条生成: {str(e)}")
+
+                results = await asyncio.gather(*[
+                    generate_speech(
+                        file_id=file_id,
+                        subtitle_index=i,
+                        text=subtitles[i]['text'],
+                        voice_name=voice_name,
+                        use_local_tts=use_local_tts,
+                        target_language=target_language,
+                        speed=speed_for(i)
+                    )
+                    for i in group
+                ], return_exceptions=True)
+
+                for i, result in zip(group, results):
+                    if isinstance(result, Exception):
+                        print(f"生成语音失败: 第 {i + 1} 个字幕: {str(result)}")
+                    elif result.get("success"):
+                        manifest.record(i, fingerprints[i])
+                    else:
+                        print(f"生成语音失败: 第 {i + 1} 个字幕")
+        finally:
+            manifest.save()
+            rate_model.flush()
+
         audio_files = []
-        total_count = len(subtitles)
-        
-        # 为每个字幕生成语音
+        clip_index = ClipIndex(audio_dir)
         for i, subtitle in enumerate(subtitles):
-           
-            # 发送进度消息
-            progress = (i + 1) / total_count * 100
-            await send_message(file_id, {
-                "type": "progress",
-                "message": f"正在生成第 {i + 1}/{total_count} 个语音",
-                "progress": progress
-            })
             # 检查字幕文本是否为空
-            if not subtitle.get('text', '').strip():
+            if fingerprints[i] is None:
                 print(f"警告：第 {i + 1} 个字幕文本为空，跳过")
                 continue
 
-            # 生成音频
-            result = await generate_speech(
-                file_id=file_id,
-                subtitle_index=i,
-                text=subtitle['text'],
-                voice_name=voice_name,
-                use_local_tts=use_local_tts,
-                target_language=target_language,
-                speed=speed
-            )
-
-            if result.get("success"):
-                audio_filename = f"{i:04d}.mp3"
-                audio_path = AUDIO_DIR / file_id / target_language / audio_filename
-                
-                # 检查音频时长
-                audio = AudioSegment.from_file(str(audio_path))
-                audio_duration = audio.duration_seconds
-                
-                # 计算与下一个字幕的间隔
-                gap_duration = 0
-                if i < len(subtitles) - 1:
-                    next_subtitle = subtitles[i + 1]
-                    gap_duration = next_subtitle["start"] - (subtitle["start"] + subtitle["duration"])
-                
-                # 可用的总时长 = 字幕时长 + 间隔时长
-                available_duration = subtitle["duration"] + gap_duration
-                
-                # 检查是否会影响下一个字幕
-                will_affect_next = audio_duration > available_duration
-
-                audio_files.append({
-                    "index": i,
-                    "file": str(audio_path.relative_to(AUDIO_DIR)),
-                    "text": subtitle['text'],
-                    "start": subtitle['start'],
-                    "duration": subtitle['duration'],
-                    "audio_duration": audio_duration,
-                    "gap_duration": gap_duration,
-                    "available_duration": available_duration,
-                    "will_affect_next": will_affect_next
-                })
-            else:
-                print(f"生成语音失败: 第 {i + 1} 个字幕")
+            audio_path = audio_dir / clip_filename(i)
+            if not audio_path.exists():
                 continue
 
+            # 从片段索引读取音频时长，无需解码
+            audio_duration = clip_index.duration(i)
+
+            # 计算与下一个字幕的间隔和可用总时长
+            gap_duration, available_duration = get_available_duration(subtitles, i)
+
+            # 检查是否会影响下一个字幕
+            will_affect_next = audio_duration > available_duration
+
+            audio_files.append({
+                "index": i,
+                "file": str(audio_path.relative_to(AUDIO_DIR)),
+                "text": subtitle['text'],
+                "start": subtitle['start'],
+                "duration": subtitle['duration'],
+                "audio_duration": audio_duration,
+                "gap_duration": gap_duration,
+                "available_duration": available_duration,
+                "will_affect_next": will_affect_next,
+                "reused": i in reuse
+            })
+
         if not audio_files:
             raise HTTPException(500, "未能生成任何语音文件")
 
@@ -406,9 +510,13 @@ async def generate_speech_single(
     target_language: str,
     use_local_tts: bool = False,
     voice_name: str = None,
-    speed: float = 1.0  # 添加语速参数
+    speed: float = 1.0,  # 添加语速参数
+    auto_fit: bool = False
 ):
-    """为单条字幕生成语音"""
+    """为单条字幕生成语音
+    Args:
+        auto_fit: 按语速模型预测时长，直接选择能放进可用时长的语速，忽略 speed
+    """
     try:
         file_id = file_id.rsplit('.', 1)[0] if '.' in file_id else file_id
         subtitle_file = SUBTITLE_DIR / f"{file_id}.json"
@@ -427,14 +535,8 @@ async def generate_speech_single(
         current_subtitle = subtitles[index]
         subtitle_duration = current_subtitle["duration"]
         
-        # 计算与下一个字幕的间隔
-        gap_duration = 0
-        if index < len(subtitles) - 1:
-            next_subtitle = subtitles[index + 1]
-            gap_duration = next_subtitle["start"] - (current_subtitle["start"] + current_subtitle["duration"])
-        
-        # 可用的总时长 = 字幕时长 + 间隔时长
-        available_duration = subtitle_duration + gap_duration
+        # 计算与下一个字幕的间隔和可用总时长
+        gap_duration, available_duration = get_available_duration(subtitles, index)
 
         # 获取要转换的文本
         text_to_convert = current_subtitle["text"]
@@ -447,6 +549,12 @@ async def generate_speech_single(
                 if translations[index]["text"]:
                     text_to_convert = translations[index]["text"]
 
+        # 自动匹配语速：合成前预测时长，一次生成即可放进可用时长
+        key = voice_key(voice_name, target_language, use_local_tts)
+        if auto_fit:
+            speed = rate_model.fit_speed(key, text_to_convert, available_duration, default=speed)
+        predicted_duration = rate_model.predict(key, text_to_convert, speed)
+
         # 生成音频
         result = await generate_speech(
             file_id=file_id,
@@ -457,10 +565,19 @@ async def generate_speech_single(
             target_language=target_language,
             speed=speed
         )
+        rate_model.flush()
 
         if result.get("success"):
-            audio_filename = f"{index:04d}.mp3"
+            audio_filename = clip_filename(index)
             audio_path = AUDIO_DIR / file_id / target_language / audio_filename
+
+            # 记录指纹，整文件重新生成时可直接复用此片段
+            manifest = ClipManifest(audio_path.parent)
+            manifest.record(index, clip_fingerprint(
+                text_to_convert, voice_name, speed, use_local_tts,
+                auto_fit_duration=available_duration if auto_fit else None
+            ))
+            manifest.save()
             
             # 下面这段重复了，因为在生成语音的时候已经把语速参数设置进去了，也就是生成的语音是按照语速生成的
             # 如果需要调整语速
@@ -476,8 +593,7 @@ async def generate_speech_single(
             # else:
                 # audio = AudioSegment.from_file(str(audio_path))
                 # audio_duration = audio.duration_seconds
-            audio = AudioSegment.from_file(str(audio_path))
-            audio_duration = audio.duration_seconds
+            audio_duration = ClipIndex(audio_path.parent).duration(index)
             print('Audio duration is %s seconds' % audio_duration)
             # 计算时长差异（相对于字幕时长）
             duration_diff = audio_duration - subtitle_duration
@@ -490,6 +606,8 @@ async def generate_speech_single(
                 "status": "success",
                 "audio_file": str(Path(file_id) / target_language / audio_filename),
                 "index": index,
+                "speed": speed,
+                "predicted_duration": predicted_duration,
                 "duration_check": {
                     "audio_duration": audio_duration,
                     "subtitle_duration": subtitle_duration,
@@ -0,0 +1,49 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def time_stretch(
+    samples: np.ndarray,
+    ratio: float,
+    sample_rate: int,
+    frame_seconds: float = 0.04,
+    tolerance_seconds: float = 0.01
+) -> np.ndarray:
+    """WSOLA 变速不变调，ratio > 1 时缩短（输出时长 = 输入时长 / ratio）
+
+    每一帧在理想位置附近的容差范围内，选取与上一帧自然延续波形互相关最大的位置，
+    再用周期 Hann 窗以 50% 重叠相加。候选位置的互相关一次矩阵乘法算出。
+    """
+    if abs(ratio - 1.0) < 1e-3 or len(samples) == 0:
+        return samples
+
+    frame = max(2, int(sample_rate * frame_seconds)) // 2 * 2
+    hop = frame // 2
+    tolerance = max(1, int(sample_rate * tolerance_seconds))
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+
+    out_length = int(round(len(samples) / ratio))
+    frames = out_length // hop + 2
+    needed = int(np.ceil(frames * hop * ratio)) + hop + frame + 2 * tolerance
+    padded = np.zeros(max(needed, len(samples) + 2 * tolerance), dtype=np.float32)
+    padded[tolerance:tolerance + len(samples)] = samples
+
+    out = np.zeros(frames * hop + frame, dtype=np.float32)
+    norm = np.zeros_like(out)
+    previous = tolerance
+    for k in range(frames):
+        ideal = tolerance + int(round(k * hop * ratio))
+        if k == 0:
+            position = ideal
+        else:
+            natural = padded[previous + hop:previous + hop + frame]
+            lo = max(0, ideal - tolerance)
+            hi = min(len(padded) - frame, ideal + tolerance)
+            candidates = sliding_window_view(padded[lo:hi + frame], frame)
+            position = lo + int(np.argmax(candidates @ natural))
+        out[k * hop:k * hop + frame] += padded[position:position + frame] * window
+        norm[k * hop:k * hop + frame] += window
+        previous = position
+
+    # 首尾只有半帧重叠，按窗口和归一化
+    np.divide(out, norm, out=out, where=norm > 1e-3)
+    return out[:out_length]
@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+@dataclass
+class PooledSynthesizer:
+    """池中的一个合成器会话，保留连接对象以维持长连接"""
+    voice_name: str
+    synthesizer: Any
+    connection: Any = None
+    uses: int = 0
+
+class _VoicePool:
+    def __init__(self, size: int):
+        self.idle: List[PooledSynthesizer] = []
+        self.slots = asyncio.Semaphore(size)
+
+class SynthesizerPool:
+    """按语音缓存预先建立连接的合成器
+
+    每个语音最多同时借出 size 个合成器。合成失败的会话会被丢弃而不是放回池中，
+    下次请求时重新创建，从而自动恢复断开的连接。
+    """
+
+    def __init__(self, factory: Callable[[str], PooledSynthesizer], size: int = 4):
+        self._factory = factory
+        self._size = max(1, size)
+        self._pools: Dict[str, _VoicePool] = {}
+
+    def _pool(self, voice_name: str) -> _VoicePool:
+        if voice_name not in self._pools:
+            self._pools[voice_name] = _VoicePool(self._size)
+        return self._pools[voice_name]
+
+    async def _create(self, voice_name: str) -> PooledSynthesizer:
+        # 建立连接是阻塞调用，放到线程池中执行
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._factory, voice_name)
+
+    @staticmethod
+    def _close(session: PooledSynthesizer):
+        if session.connection is not None:
+            try:
+                session.connection.close()
+            except Exception as e:
+                print(f"关闭合成器连接失败: {str(e)}")
+
+    @asynccontextmanager
+    async def session(self, voice_name: str):
+        """借出一个合成器会话，用完后自动归还"""
+        pool = self._pool(voice_name)
+        await pool.slots.acquire()
+        try:
+            session = pool.idle.pop() if pool.idle else await self._create(voice_name)
+            try:
+                yield session
+            except BaseException:
+                self._close(session)
+                raise
+            session.uses += 1
+            pool.idle.append(session)
+        finally:
+            pool.slots.release()
+
+    async def warm_up(self, voice_name: str, count: int = 1):
+        """预先为指定语音建立连接"""
+        pool = self._pool(voice_name)
+        missing = min(count, self._size) - len(pool.idle)
+        sessions = await asyncio.gather(*(self._create(voice_name) for _ in range(max(0, missing))))
+        pool.idle.extend(sessions)
+
+    def close(self):
+        """关闭所有空闲会话"""
+        for pool in self._pools.values():
+            while pool.idle:
+                self._close(pool.idle.pop())
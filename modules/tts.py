@@ -2,15 +2,33 @@ import torch
 from pathlib import Path
 from fastapi import HTTPException
 import numpy as np
-import edge_tts
 import asyncio
-import io
-from pydub import AudioSegment
 import langid
+import math
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Set, Tuple
+from .edge_session import EdgeSessionManager
+from .mp3_stream import StreamingMp3Decoder
+from .stretch import time_stretch
+from .config import (
+    LOCAL_TTS_ENGINE,
+    LOCAL_TTS_MODELS,
+    LOCAL_TTS_SPEAKERS,
+    LOCAL_TTS_VOICES,
+    LOCAL_TTS_WORKERS,
+    LOCAL_TTS_DEVICE,
+    LOCAL_TTS_PRELOAD,
+    LOCAL_TTS_BATCH_SIZE,
+    LOCAL_TTS_BATCH_WINDOW,
+    EDGE_TTS_SAMPLE_RATE
+)
 
 class EdgeTTS:
     def __init__(self):
         self.initialized = True
+        # 预热的 WebSocket 连接池，避免每条字幕都重新握手
+        self.sessions = EdgeSessionManager()
         
         # 语言到声音的映射
         self.voice_map = {
@@ -63,6 +81,8 @@ class EdgeTTS:
             language: 语言代码 (zh-CN, en-US, etc.)
             voice_name: 指定的声音名称
             speed: 语速 (0.5-2.0)
+        Returns:
+            (samples, sample_rate): int16 单声道采样和采样率
         """
         try:
             # 如果没有指定语言，自动检测
@@ -79,41 +99,178 @@ class EdgeTTS:
             
             print(f"使用语言: {language}, 声音: {voice_name}")
             
-            # 创建临时文件
-            temp_file = io.BytesIO()
-            
-            # 生成音频
+            # 生成音频（复用连接池中的 WebSocket 连接）
             print('speed is {0}'.format(speed))
-            communicate = edge_tts.Communicate(
-                text, 
-                voice_name, 
-                rate=f"+{int((speed-1)*100)}%"  # 格式应为 "+0%", "+50%", "-50%" 等
-            )
-            # edge-tts 使用百分比字符串来表示语速
-            
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    temp_file.write(chunk["data"])
-            
-            # 重置缓冲区指针
-            temp_file.seek(0)
-            
-            # 从 MP3 格式加载音频
-            audio_segment = AudioSegment.from_mp3(temp_file)
-            
-            # 转换为单声道
-            if audio_segment.channels > 1:
-                audio_segment = audio_segment.set_channels(1)
-            
-            # 转换为 numpy array
-            samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
-            samples = samples / (2**15)  # 转换为 [-1, 1] 范围
-            
-            return samples
+            # edge-tts 使用百分比字符串来表示语速，格式应为 "+0%", "+50%", "-50%" 等
+            rate = f"{int(round((speed - 1) * 100)):+d}%"
+
+            # 音频块到达时立即解码，按文本长度预估缓冲区大小（约每字符 0.1 秒）
+            decoder = StreamingMp3Decoder(expected_samples=int(len(text) * 0.1 * EDGE_TTS_SAMPLE_RATE))
+            async for chunk in self.sessions.stream(text, voice_name, rate):
+                decoder.feed(chunk)
+            samples = decoder.finish()
+            if not len(samples):
+                raise ValueError("未解码出音频数据")
+
+            return samples, decoder.sample_rate
             
         except Exception as e:
             print(f"生成语音失败: {str(e)}")
             raise HTTPException(500, f"生成语音失败: {str(e)}")
 
+# 工作进程内已加载的模型，每个进程每个模型只加载一次
+_worker_models = {}
+
+def _load_worker_model(model_name: str):
+    if model_name not in _worker_models:
+        from TTS.api import TTS
+        print(f"加载本地 TTS 模型: {model_name}")
+        _worker_models[model_name] = TTS(model_name, progress_bar=False).to(LOCAL_TTS_DEVICE)
+    return _worker_models[model_name]
+
+def _init_worker(model_names: List[str]):
+    """工作进程初始化：限制每个进程的线程数并预加载模型"""
+    torch.set_num_threads(1)
+    for model_name in model_names:
+        _load_worker_model(model_name)
+
+def _synthesize_batch(model_name: str, speaker: str, items: List[Tuple[str, float]]):
+    """在工作进程中合成同一模型、同一说话人的一批文本
+    Returns:
+        (wavs, sample_rate): float32 采样列表和采样率
+    """
+    model = _load_worker_model(model_name)
+    tts_model = model.synthesizer.tts_model
+    sample_rate = model.synthesizer.output_sample_rate
+    default_length_scale = getattr(tts_model, "length_scale", None)
+    wavs = []
+    try:
+        for text, speed in items:
+            # VITS 等模型通过 length_scale 控制语速
+            if default_length_scale is not None:
+                tts_model.length_scale = default_length_scale / speed
+            wav = np.asarray(model.tts(text=text, speaker=speaker if model.is_multi_speaker else None), dtype=np.float32)
+            # Tacotron2 等没有 length_scale 的模型，合成后变速不变调
+            if default_length_scale is None:
+                wav = time_stretch(wav, speed, sample_rate)
+            wavs.append(wav)
+    finally:
+        if default_length_scale is not None:
+            tts_model.length_scale = default_length_scale
+    return wavs, sample_rate
+
+class CoquiTTS:
+    """离线神经 TTS（Coqui TTS）
+
+    模型在进程池的每个工作进程中只加载一次；并发的请求按 (模型, 说话人) 在短时间窗口内
+    合并成批，再平均分给各工作进程并行合成（省去逐条提交的进程间往返），结果直接以
+    NumPy 数组返回。工作进程崩溃时重建进程池并重试一次。
+    指定的语音按 LOCAL_TTS_VOICES 对应到本地说话人；没有对应说话人的语音和
+    没有本地模型的语言回退到 edge-tts。
+    """
+
+    def __init__(self, fallback: EdgeTTS, workers: int = LOCAL_TTS_WORKERS):
+        self.fallback = fallback
+        self.workers = max(1, workers)
+        self._executor = None
+        self._pending: Dict[Tuple[str, str], list] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        # 正在运行的批次任务，保留引用防止被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            preload = [LOCAL_TTS_MODELS[lang] for lang in LOCAL_TTS_PRELOAD if lang in LOCAL_TTS_MODELS]
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(preload,)
+            )
+        return self._executor
+
+    def _flush(self, key: Tuple[str, str]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if not batch:
+            return
+        # 每个工作进程单线程，批次按进程数切分后并行提交
+        chunk_size = math.ceil(len(batch) / self.workers)
+        for start in range(0, len(batch), chunk_size):
+            task = asyncio.ensure_future(self._run_batch(key, batch[start:start + chunk_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _reset_executor(self, executor: ProcessPoolExecutor):
+        """工作进程异常退出后进程池不可再用，丢弃后下次提交时重建"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_batch(self, key: Tuple[str, str], batch: list):
+        model_name, speaker = key
+        loop = asyncio.get_running_loop()
+        items = [(text, speed) for text, speed, _ in batch]
+        try:
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    wavs, sample_rate = await loop.run_in_executor(
+                        executor, _synthesize_batch, model_name, speaker, items
+                    )
+                    break
+                except BrokenProcessPool:
+                    self._reset_executor(executor)
+                    if attempt == 1:
+                        raise
+                    print("本地 TTS 工作进程异常退出，重建进程池后重试")
+            for (_, _, future), wav in zip(batch, wavs):
+                if not future.done():
+                    future.set_result((wav, sample_rate))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def generate_speech(self, text: str, language: str = None, voice_name: str = None, speed: float = 1.0):
+        """生成语音，接口与 EdgeTTS.generate_speech 相同
+        Returns:
+            (samples, sample_rate): [-1, 1] 范围的 float32 采样和采样率
+        """
+        if language is None:
+            language = self.fallback.detect_language(text)
+        if voice_name:
+            model_name, speaker = LOCAL_TTS_VOICES.get(voice_name, (None, None))
+            if model_name is None:
+                print(f"语音 {voice_name} 没有对应的本地说话人，使用 edge-tts")
+                return await self.fallback.generate_speech(text, language, voice_name, speed)
+        else:
+            base_lang = language.split('-')[0]
+            model_name = LOCAL_TTS_MODELS.get(language) or LOCAL_TTS_MODELS.get(base_lang)
+            if model_name is None:
+                print(f"没有 {language} 的本地模型，使用 edge-tts")
+                return await self.fallback.generate_speech(text, language, voice_name, speed)
+            speaker = LOCAL_TTS_SPEAKERS.get(model_name)
+
+        try:
+            key = (model_name, speaker)
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending.setdefault(key, []).append((text, speed or 1.0, future))
+
+            # 批次满了立即提交，否则等待一个短时间窗口收集同一语音的其他请求
+            if len(self._pending[key]) >= LOCAL_TTS_BATCH_SIZE:
+                self._flush(key)
+            elif key not in self._timers:
+                self._timers[key] = loop.call_later(LOCAL_TTS_BATCH_WINDOW, self._flush, key)
+
+            return await future
+        except Exception as e:
+            print(f"本地 TTS 生成语音失败: {str(e)}")
+            raise HTTPException(500, f"本地 TTS 生成语音失败: {str(e)}")
+
 # 创建全局 TTS 实例
-tts = EdgeTTS()
\ No newline at end of file
+edge_tts_engine = EdgeTTS()
+tts = CoquiTTS(edge_tts_engine) if LOCAL_TTS_ENGINE == "coqui" else edge_tts_engine
\ No newline at end of file
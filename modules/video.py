@@ -3,16 +3,38 @@ from fastapi import HTTPException
 import subprocess
 import asyncio
 import json  # 添加 json 导入
+import hashlib
+import shutil
 from pathlib import Path
 from moviepy.editor import VideoFileClip
 from .config import (
-    UPLOAD_DIR,
     SUBTITLE_DIR,
     TEMP_DIR,
     SUBTITLED_VIDEO_DIR,
-    MERGED_DIR
+    MERGED_DIR,
+    BURN_SEGMENT_SECONDS,
+    BURN_WORKERS,
+    LANGUAGE_CODE_MAP,
+    ISO_639_2_CODES,
+    PREVIEW_HEIGHT,
+    PREVIEW_DEFAULT_SECONDS,
+    PREVIEW_MAX_SECONDS,
+    PREVIEW_MAX_FILES,
+    ENCODE_PROFILES,
+    DEFAULT_ENCODE_PROFILE,
+    ASS_CACHE_DIR,
+    ASS_CACHE_MAX_FILES,
+    SEGMENT_CACHE_DIR,
+    BURN_RECORD_DIR,
+    ENCODE_CPU_COUNT,
+    SUPPORTED_VOICES
 )
 from .utils import convert_to_srt  # 改为从 utils 导入
+from .segments import plan_segments, probe_duration, probe_keyframes
+from .burn_jobs import BurnCancelled, BurnJob, burn_jobs
+from .burn_cache import SegmentCache, segment_signature
+from .clips import file_stamp
+from .mezzanine import source_video, upload_path
 import ass
 
 # 颜色转换函数
@@ -96,25 +118,50 @@ def process_margin_params(data: dict) -> dict:
         'marginR': "10"   # 右边距
     }
 
-async def burn_subtitles(file_id: str, language: str, style: dict):
+BURN_MODES = ("single", "parallel", "soft")
+SOFT_SUB_CONTAINERS = ("mkv", "mp4")
+
+async def burn_subtitles(
+    file_id: str,
+    language: str,
+    style: dict,
+    mode: str = "single",
+    container: str = "mkv",
+    profile: str = DEFAULT_ENCODE_PROFILE
+):
     """将字幕烧录到视频中
     Args:
         file_id (str): 视频文件ID
         language (str): 目标语言
         style (dict): 字幕样式配置
+        mode (str): single 单进程编码整个视频；parallel 在关键帧处分段并行烧录后无损拼接；
+            soft 不重新编码，把各语言字幕作为字幕流封装（视频流直接复制）
+        container (str): soft 模式的输出格式，mkv（保留 ASS 样式）或 mp4（mov_text）
+        profile (str): 编码档位，见 ENCODE_PROFILES
     Returns:
         dict: 包含处理结果的字典
     """
+    if mode not in BURN_MODES:
+        raise HTTPException(400, f"不支持的烧录模式: {mode}")
+    if mode == "soft" and container not in SOFT_SUB_CONTAINERS:
+        raise HTTPException(400, f"不支持的封装格式: {container}")
+    encode_profile = get_encode_profile(profile)
+
     # 准备文件路径
     file_id_without_ext = Path(file_id).stem
     paths = {
-        'video': UPLOAD_DIR / f"{file_id_without_ext}.mp4",
+        'video': source_video(file_id_without_ext),
         'subtitle': SUBTITLE_DIR / f"{file_id_without_ext}_{language}.json",
         'audio': MERGED_DIR / file_id_without_ext / f"{language}.mp3",
-        'output': SUBTITLED_VIDEO_DIR / f"{file_id_without_ext}_subtitled.mp4",
-        'ass': TEMP_DIR / f"{file_id_without_ext}.ass",
+        'output': SUBTITLED_VIDEO_DIR / f"{file_id_without_ext}_{language}_subtitled.mp4",
         'font': Path("static/fonts/SimSun.ttf")
     }
+    if mode == "soft":
+        # 视频流直接复制，使用原始上传文件保留原画质，不使用重新编码的中间文件
+        paths['video'] = upload_path(file_id_without_ext)
+        paths['output'] = SUBTITLED_VIDEO_DIR / f"{file_id_without_ext}_softsub.{container}"
+    # 本次是否直接写输出文件；remux 只写临时文件，取消或超时时必须保留原有输出
+    writes_output = False
 
     try:
         # 创建必要的目录
@@ -130,29 +177,53 @@ async def burn_subtitles(file_id: str, language: str, style: dict):
         # 计算字幕框参数
         subtitle_params = calculate_subtitle_params(style)
         
-        # 转换字幕格式
-        await json_to_ass(paths['subtitle'], paths['ass'], {
+        ass_style = {
             **convert_subtitle_style(style),
             'marginV': str(subtitle_params['margin_v'])
-        })
+        }
 
-        # 构建 FFmpeg 命令
-        cmd = build_ffmpeg_command(paths, subtitle_params)
-        
-        # 执行 FFmpeg 命令
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        # 上次烧录的字幕和样式未变化时只需替换配音
+        fingerprint = None
+        if mode != "soft":
+            fingerprint = burn_fingerprint(paths, ass_style, profile)
+            previous = read_sidecar(paths['output'])
+            if paths['output'].exists() and previous.get('fingerprint') == fingerprint:
+                if previous.get('audio') == file_stamp(paths['audio']):
+                    print("字幕、样式和配音均未变化，直接使用已有输出")
+                    return {
+                        "status": "success",
+                        "message": "字幕烧录完成",
+                        "output_file": str(paths['output'].name)
+                    }
+                mode = "remux"
+            else:
+                sidecar_path(paths['output']).unlink(missing_ok=True)
+
+        # 烧录任务推送进度，可通过 cancel_burn 取消，超过 BURN_TIMEOUT_SECONDS 自动终止
+        # 探测时长需要解复用整个文件，放到线程池中执行，避免阻塞事件循环
+        duration = await asyncio.get_running_loop().run_in_executor(None, probe_duration, paths['video'])
+        writes_output = mode != "remux"
+        async with burn_jobs.start(file_id_without_ext, duration) as job:
+            if mode == "soft":
+                await mux_soft_subtitles(paths, language, ass_style, container, job)
+            elif mode == "remux":
+                print("字幕和样式未变化，只替换配音")
+                job.begin_stage("替换配音")
+                await remux_audio(paths, encode_profile, job)
+            elif mode == "parallel":
+                await burn_segments(paths, ass_style, profile=profile, job=job)
+            else:
+                # 转换字幕格式（相同字幕和样式直接复用缓存的 ASS 文件）
+                paths['ass'] = cached_ass(read_json_subtitles(paths['subtitle']), ass_style)
 
-        if process.returncode != 0:
-            raise HTTPException(500, f"FFmpeg 执行失败: {stderr.decode()}")
+                # 构建并执行 FFmpeg 命令
+                await run_ffmpeg(build_ffmpeg_command(paths, subtitle_params, encode_profile), job)
 
         # 验证输出文件
         if not paths['output'].exists() or paths['output'].stat().st_size == 0:
             raise HTTPException(500, "输出文件无效")
+        if fingerprint is not None:
+            write_sidecar(paths['output'], fingerprint, paths['audio'])
 
         return {
             "status": "success",
@@ -160,15 +231,234 @@ async def burn_subtitles(file_id: str, language: str, style: dict):
             "output_file": str(paths['output'].name)
         }
 
+    except BurnCancelled:
+        if writes_output:
+            paths['output'].unlink(missing_ok=True)
+        raise HTTPException(409, "烧录任务已取消")
+    except Exception as e:
+        print(f"烧录字幕失败: {str(e)}")
+        if isinstance(e, HTTPException):
+            if e.status_code == 504 and writes_output:
+                paths['output'].unlink(missing_ok=True)
+            raise
+        raise HTTPException(500, f"烧录字幕失败: {str(e)}")
+
+async def burn_subtitles_multi(file_id: str, languages: list, style: dict, profile: str = DEFAULT_ENCODE_PROFILE):
+    """一次解码，同时烧录多种语言的字幕
+
+    源视频只解码一次，用 split 分成 N 路，每路叠加各自语言的 ASS 字幕并映射
+    对应的配音，由同一个 ffmpeg 进程写出 N 个 <id>_<语言>_subtitled.mp4。
+    """
+    languages = list(dict.fromkeys(lang for lang in languages if lang))
+    if not languages:
+        raise HTTPException(400, "请至少指定一种语言")
+    encode_profile = get_encode_profile(profile)
+
+    file_id_without_ext = Path(file_id).stem
+    video_path = source_video(file_id_without_ext)
+    font_path = Path("static/fonts/SimSun.ttf")
+    targets = [
+        {
+            'language': lang,
+            'subtitle': SUBTITLE_DIR / f"{file_id_without_ext}_{lang}.json",
+            'audio': MERGED_DIR / file_id_without_ext / f"{lang}.mp3",
+            'output': SUBTITLED_VIDEO_DIR / f"{file_id_without_ext}_{lang}_subtitled.mp4"
+        }
+        for lang in languages
+    ]
+
+    try:
+        for directory in [SUBTITLED_VIDEO_DIR, TEMP_DIR]:
+            directory.mkdir(exist_ok=True)
+
+        if not video_path.exists():
+            raise HTTPException(500, f"找不到video文件: {video_path}")
+        for target in targets:
+            for key in ('subtitle', 'audio'):
+                if not target[key].exists():
+                    raise HTTPException(500, f"找不到{key}文件: {target[key]}")
+
+        subtitle_params = calculate_subtitle_params(style)
+        ass_style = {
+            **convert_subtitle_style(style),
+            'marginV': str(subtitle_params['margin_v'])
+        }
+        fingerprints = {}
+        for target in targets:
+            target['ass'] = cached_ass(read_json_subtitles(target['subtitle']), ass_style)
+            fingerprints[target['language']] = burn_fingerprint({**target, 'video': video_path}, ass_style, profile)
+            sidecar_path(target['output']).unlink(missing_ok=True)
+
+        cmd = build_multi_output_command(video_path, font_path, targets, encode_profile)
+        duration = await asyncio.get_running_loop().run_in_executor(None, probe_duration, video_path)
+        async with burn_jobs.start(file_id_without_ext, duration) as job:
+            await run_ffmpeg(cmd, job)
+
+        for target in targets:
+            if not target['output'].exists() or target['output'].stat().st_size == 0:
+                raise HTTPException(500, f"输出文件无效: {target['output'].name}")
+            write_sidecar(target['output'], fingerprints[target['language']], target['audio'])
+
+        return {
+            "status": "success",
+            "message": "字幕烧录完成",
+            "output_files": {target['language']: target['output'].name for target in targets}
+        }
+
+    except BurnCancelled:
+        for target in targets:
+            target['output'].unlink(missing_ok=True)
+        raise HTTPException(409, "烧录任务已取消")
     except Exception as e:
         print(f"烧录字幕失败: {str(e)}")
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(500, f"烧录字幕失败: {str(e)}")
+
+async def cancel_burn(file_id: str):
+    """取消正在运行的烧录任务"""
+    if not await burn_jobs.cancel(Path(file_id).stem):
+        raise HTTPException(404, "没有正在运行的烧录任务")
+    return {"status": "success", "message": "烧录任务已取消"}
+
+def content_hash(data) -> str:
+    """JSON 可序列化内容的短哈希"""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def burn_fingerprint(paths: dict, ass_style: dict, profile: str) -> str:
+    """烧录画面的指纹：源视频（修改时间、大小）、字幕内容、样式和编码档位，不含配音"""
+    return content_hash([
+        paths['video'].name, file_stamp(paths['video']),
+        read_json_subtitles(paths['subtitle']), ass_style, profile, ENCODE_PROFILES[profile]
+    ])
+
+def sidecar_path(output: Path) -> Path:
+    """烧录输出的指纹记录，按输出文件名保存在 BURN_RECORD_DIR"""
+    return BURN_RECORD_DIR / f"{output.stem}.json"
+
+def read_sidecar(output: Path) -> dict:
+    """读取烧录记录；输出文件已被替换或删除时记录作废，返回空字典"""
+    path = sidecar_path(output)
+    if not path.exists() or not output.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"读取烧录记录失败: {str(e)}")
+        return {}
+    if record.get('output') != file_stamp(output):
+        return {}
+    return record
+
+def write_sidecar(output: Path, fingerprint: str, audio_path: Path):
+    path = sidecar_path(output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'audio': file_stamp(audio_path), 'output': file_stamp(output)}, f)
+    os.replace(tmp_path, path)
+    # 旧版本把记录写在输出文件旁（公开目录）
+    output.with_suffix('.burn.json').unlink(missing_ok=True)
+
+async def remux_audio(paths: dict, profile: dict, job: BurnJob = None):
+    """保留已烧录输出的视频流（-c:v copy），只替换配音"""
+    tmp_path = paths['output'].with_name(f"{paths['output'].stem}.remux.mp4")
+    try:
+        await run_ffmpeg([
+            'ffmpeg', '-y',
+            '-i', str(paths['output']),
+            '-i', str(paths['audio']),
+            '-map', '0:v',
+            '-map', '1:a',
+            '-c:v', 'copy',
+            *audio_encode_args(profile),
+            *FASTSTART_ARGS,
+            str(tmp_path)
+        ], job)
+        os.replace(tmp_path, paths['output'])
     finally:
-        # 清理临时文件
-        if paths['ass'].exists():
-            paths['ass'].unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+
+async def render_preview(file_id: str, language: str, style: dict, timestamp: float, duration: float = PREVIEW_DEFAULT_SECONDS):
+    """以低分辨率和 ultrafast 预设渲染 [timestamp, timestamp + duration) 的样式预览
+
+    结果按 (源视频, 样式哈希, 窗口内字幕哈希, 窗口) 缓存，只调整样式或修改窗口外的字幕时
+    直接复用；预览目录超过 PREVIEW_MAX_FILES 个文件时删除最久未用的预览。
+    """
+    duration = min(max(duration, 1.0), PREVIEW_MAX_SECONDS)
+    start = max(0.0, float(timestamp))
+    end = start + duration
+    file_id_without_ext = Path(file_id).stem
+    video_path = source_video(file_id_without_ext)
+    subtitle_path = SUBTITLE_DIR / f"{file_id_without_ext}_{language}.json"
+    audio_path = MERGED_DIR / file_id_without_ext / f"{language}.mp3"
+    font_path = Path("static/fonts/SimSun.ttf")
+
+    for path in (video_path, subtitle_path):
+        if not path.exists():
+            raise HTTPException(404, f"找不到文件: {path}")
+
+    try:
+        subtitle_params = calculate_subtitle_params(style)
+        ass_style = {
+            **convert_subtitle_style(style),
+            'marginV': str(subtitle_params['margin_v'])
+        }
+        window_subtitles = shift_subtitles(read_json_subtitles(subtitle_path), start, end)
+        audio_stamp = audio_path.stat().st_mtime_ns if audio_path.exists() else None
+        key = content_hash([
+            video_path.name, file_stamp(video_path),
+            ass_style, window_subtitles, round(start, 3), round(duration, 3), audio_stamp
+        ])
+
+        preview_dir = SUBTITLED_VIDEO_DIR / "previews"
+        preview_dir.mkdir(parents=True, exist_ok=True)
+        output = preview_dir / f"{file_id_without_ext}_{language}_{key}.mp4"
+        result = {
+            "status": "success",
+            "preview_file": f"previews/{output.name}",
+            "start": start,
+            "duration": duration
+        }
+        if output.exists():
+            # 更新修改时间，清理时按最近使用排序
+            output.touch()
+            return {**result, "cached": True}
+
+        ass_path = cached_ass(window_subtitles, ass_style)
+        cmd = ['ffmpeg', '-y', '-ss', f'{start:.3f}', '-i', str(video_path)]
+        if audio_path.exists():
+            cmd.extend(['-ss', f'{start:.3f}', '-i', str(audio_path), '-map', '0:v', '-map', '1:a'])
+        else:
+            cmd.extend(['-map', '0:v', '-map', '0:a?'])
+        cmd.extend([
+            '-t', f'{duration:.3f}',
+            '-vf', f"scale=-2:{PREVIEW_HEIGHT},{build_subtitle_filter(ass_path, font_path)}",
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-crf', '28',
+            '-c:a', 'aac',
+            '-movflags', '+faststart',
+            str(output)
+        ])
+        try:
+            await run_ffmpeg(cmd)
+        except Exception:
+            output.unlink(missing_ok=True)
+            raise
+
+        previews = sorted(preview_dir.glob("*.mp4"), key=lambda path: path.stat().st_mtime_ns)
+        for path in previews[:max(0, len(previews) - PREVIEW_MAX_FILES)]:
+            path.unlink(missing_ok=True)
+        return {**result, "cached": False}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"渲染预览失败: {str(e)}")
+        raise HTTPException(500, f"渲染预览失败: {str(e)}")
 
 def calculate_subtitle_params(style: dict, text: str = "") -> dict:
     """计算字幕框参数"""
@@ -193,31 +483,325 @@ def calculate_subtitle_params(style: dict, text: str = "") -> dict:
         'line_count': lines
     }
 
-def build_ffmpeg_command(paths: dict, subtitle_params: dict) -> list:
+async def run_ffmpeg(cmd: list, job: BurnJob = None, slot: int = 0):
+    """执行 FFmpeg 命令，失败时抛出 HTTPException；指定 job 时由任务跟踪进度、取消和超时"""
+    if job is not None:
+        await job.run(cmd, slot)
+        return
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise HTTPException(500, f"FFmpeg 执行失败: {stderr.decode()}")
+
+def build_subtitle_filter(ass_path: Path, font_path: Path) -> str:
+    """构建 ass 字幕滤镜"""
+    if font_path.exists():
+        return f'ass={str(ass_path)}:fontsdir={font_path.parent}'
+    return f'ass={str(ass_path)}'
+
+def get_encode_profile(name: str) -> dict:
+    """按名称取编码档位，未知名称返回 400"""
+    if name not in ENCODE_PROFILES:
+        raise HTTPException(400, f"不支持的编码档位: {name}")
+    return ENCODE_PROFILES[name]
+
+def build_scale_filter(profile: dict) -> str:
+    """缩放到档位高度，不放大低分辨率源"""
+    return f"scale=-2:'min({profile['height']},ih)'"
+
+def build_video_filter(profile: dict, subtitle_filter: str) -> str:
+    """先按档位缩放再叠加字幕，字幕按输出分辨率渲染"""
+    if profile.get('height'):
+        return f"{build_scale_filter(profile)},{subtitle_filter}"
+    return subtitle_filter
+
+def video_encode_args(profile: dict, threads: int = None) -> list:
+    """编码档位对应的 libx264 参数，threads 指定时覆盖档位设置"""
+    args = ['-c:v', 'libx264', '-preset', profile['preset'], '-crf', str(profile['crf'])]
+    if profile.get('maxrate'):
+        args.extend(['-maxrate', profile['maxrate'], '-bufsize', profile['bufsize']])
+    if profile.get('tune'):
+        args.extend(['-tune', profile['tune']])
+    threads = profile.get('threads') if threads is None else threads
+    if threads:
+        args.extend(['-threads', str(threads)])
+    return args
+
+def audio_encode_args(profile: dict) -> list:
+    return ['-c:a', 'aac', '-b:a', profile['audio_bitrate']]
+
+# mp4 输出把 moov 放到文件开头，便于边下边播
+FASTSTART_ARGS = ['-movflags', '+faststart']
+
+def build_ffmpeg_command(paths: dict, subtitle_params: dict, profile: dict = None) -> list:
     """构建 FFmpeg 命令"""
+    profile = profile or ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE]
     base_cmd = [
         'ffmpeg', '-y',
         '-i', str(paths['video']),
         '-i', str(paths['audio'])
     ]
 
-    if paths['font'].exists():
-        vf = f'ass={str(paths["ass"])}:fontsdir={paths["font"].parent}'
-    else:
-        vf = f'ass={str(paths["ass"])}'
+    vf = build_video_filter(profile, build_subtitle_filter(paths['ass'], paths['font']))
 
     return [
         *base_cmd,
         '-vf', vf,
-        '-c:v', 'libx264',
-        '-preset', 'medium',
-        '-crf', '23',
-        '-c:a', 'aac',
+        *video_encode_args(profile),
+        *audio_encode_args(profile),
         '-map', '0:v',
         '-map', '1:a',
+        *FASTSTART_ARGS,
         str(paths['output'])
     ]
 
+def build_multi_output_command(video_path: Path, font_path: Path, targets: list, profile: dict = None) -> list:
+    """构建一次解码、多路输出的烧录命令"""
+    profile = profile or ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE]
+    cmd = ['ffmpeg', '-y', '-i', str(video_path)]
+    for target in targets:
+        cmd.extend(['-i', str(target['audio'])])
+
+    # 缩放放在 split 之前，只做一次
+    source = f"[0:v]{build_scale_filter(profile)}," if profile.get('height') else '[0:v]'
+    branches = ''.join(f'[v{i}]' for i in range(len(targets)))
+    filter_complex = f'{source}split={len(targets)}{branches};' + ';'.join(
+        f'[v{i}]{build_subtitle_filter(target["ass"], font_path)}[out{i}]'
+        for i, target in enumerate(targets)
+    )
+    cmd.extend(['-filter_complex', filter_complex])
+
+    for i, target in enumerate(targets):
+        cmd.extend([
+            '-map', f'[out{i}]',
+            '-map', f'{i + 1}:a',
+            *video_encode_args(profile),
+            *audio_encode_args(profile),
+            *FASTSTART_ARGS,
+            str(target['output'])
+        ])
+    return cmd
+
+def build_segment_command(
+    paths: dict, ass_path: Path, output: Path, start: float, end: float, threads: int, profile: dict = None
+) -> list:
+    """构建单个分段的烧录命令：从关键帧处输入定位，只编码视频"""
+    profile = profile or ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE]
+    return [
+        'ffmpeg', '-y',
+        '-ss', f'{start:.6f}',
+        '-i', str(paths['video']),
+        '-t', f'{end - start:.6f}',
+        '-vf', build_video_filter(profile, build_subtitle_filter(ass_path, paths['font'])),
+        '-an',
+        *video_encode_args(profile, threads),
+        str(output)
+    ]
+
+def overlapping_cues(subtitles: list, start: float, end: float) -> list:
+    """与 [start, end) 重叠的字幕索引"""
+    indices = []
+    for index, subtitle in enumerate(subtitles):
+        try:
+            sub_start = float(subtitle['start'])
+            sub_end = sub_start + float(subtitle['duration'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if sub_end > start and sub_start < end:
+            indices.append(index)
+    return indices
+
+def shift_subtitles(subtitles: list, start: float, end: float) -> list:
+    """取出与 [start, end) 重叠的字幕，时间平移到分段开头并裁剪到分段范围内"""
+    shifted = []
+    for index in overlapping_cues(subtitles, start, end):
+        subtitle = subtitles[index]
+        sub_start = float(subtitle['start'])
+        sub_end = sub_start + float(subtitle['duration'])
+        clipped_start = max(sub_start, start)
+        shifted.append({
+            **subtitle,
+            'start': clipped_start - start,
+            'duration': min(sub_end, end) - clipped_start
+        })
+    return shifted
+
+async def burn_segments(
+    paths: dict,
+    ass_style: dict,
+    workers: int = BURN_WORKERS,
+    profile: str = DEFAULT_ENCODE_PROFILE,
+    job: BurnJob = None
+):
+    """分段并行烧录
+
+    在关键帧处把视频切成约 BURN_SEGMENT_SECONDS 长的分段，每段使用平移后的
+    字幕由独立的 ffmpeg 进程编码，最后用 concat 无损拼接并一次性混入配音。
+    分段结果缓存在 SEGMENT_CACHE_DIR/<输出名> 目录，重新烧录时只编码重叠字幕或样式
+    有变化的分段。
+    """
+    encode_profile = get_encode_profile(profile)
+    subtitles = read_json_subtitles(paths['subtitle'])
+    loop = asyncio.get_running_loop()
+    keyframes, duration = await loop.run_in_executor(None, probe_keyframes, paths['video'])
+    segments = plan_segments(keyframes, duration, BURN_SEGMENT_SECONDS)
+
+    # 旧版本把分段缓存放在输出文件旁（公开目录），迁移后删除
+    shutil.rmtree(paths['output'].with_suffix('.segments'), ignore_errors=True)
+    cache = SegmentCache(SEGMENT_CACHE_DIR / paths['output'].stem)
+    cache.cache_dir.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for start, end in segments:
+        shifted = shift_subtitles(subtitles, start, end)
+        entries.append({
+            'start': start,
+            'end': end,
+            'sig': segment_signature(paths['video'], start, end, shifted, ass_style, encode_profile),
+            'subtitles': shifted
+        })
+    dirty = [i for i, entry in enumerate(entries) if not cache.is_cached(entry['sig'])]
+
+    workers = max(1, min(workers, len(dirty) or 1))
+    # 每个分段进程的线程数不超过档位设置，所有并行进程合计不超过核心数
+    threads = max(1, min(encode_profile['threads'], ENCODE_CPU_COUNT // workers))
+    print(f"分段烧录: {len(segments)} 个分段，需要编码 {len(dirty)} 个，{workers} 个并行进程")
+
+    semaphore = asyncio.Semaphore(workers)
+
+    async def burn_segment(index: int):
+        entry = entries[index]
+        ass_path = cache.cache_dir / f"{index:04d}.ass"
+        write_ass_stream(ass_path, entry['subtitles'], ass_style)
+        try:
+            async with semaphore:
+                await run_ffmpeg(build_segment_command(
+                    paths, ass_path, cache.temp_path(entry['sig']), entry['start'], entry['end'], threads,
+                    encode_profile
+                ), job, index)
+            cache.commit(entry['sig'])
+        finally:
+            ass_path.unlink(missing_ok=True)
+            cache.temp_path(entry['sig']).unlink(missing_ok=True)
+
+    if job is not None:
+        # 直接复用的分段计入已完成进度
+        for i, entry in enumerate(entries):
+            if i not in dirty:
+                job.positions[i] = entry['end'] - entry['start']
+
+    tasks = [asyncio.create_task(burn_segment(i)) for i in dirty]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # 一个分段失败（或整个烧录被取消）时取消其余分段，等它们清理完再抛出
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if job is not None:
+            await job.cancel()
+        raise
+
+    if job is not None:
+        job.begin_stage("拼接分段")
+
+    concat_list = cache.cache_dir / "segments.txt"
+    with open(concat_list, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(f"file '{cache.segment_path(entry['sig']).resolve()}'\n")
+
+    try:
+        await run_ffmpeg([
+            'ffmpeg', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', str(concat_list),
+            '-i', str(paths['audio']),
+            '-map', '0:v',
+            '-map', '1:a',
+            '-c:v', 'copy',
+            *audio_encode_args(encode_profile),
+            *FASTSTART_ARGS,
+            str(paths['output'])
+        ], job)
+    finally:
+        concat_list.unlink(missing_ok=True)
+
+    cache.save([
+        {key: entry[key] for key in ('start', 'end', 'sig')}
+        for entry in entries
+    ])
+
+def language_tag(language: str) -> str:
+    """ISO 639-2 语言标签，未知语言为 und"""
+    base = LANGUAGE_CODE_MAP.get(language, language.split('-')[0])
+    return ISO_639_2_CODES.get(base, "und")
+
+def find_subtitle_languages(file_id_without_ext: str, language: str) -> list:
+    """列出已有翻译字幕的语言 [(语言, JSON 路径)]，当前语言排在最前
+
+    只检查翻译模块的命名 <文件名>_<语言代码>.json，语言代码限于已知语言，
+    同前缀的其他 JSON（双语字幕等）不会被当作字幕语言。
+    """
+    known = set(LANGUAGE_CODE_MAP) | set(SUPPORTED_VOICES) | {language}
+    found = []
+    for lang in sorted(known):
+        path = SUBTITLE_DIR / f"{file_id_without_ext}_{lang}.json"
+        if path.exists():
+            found.append((lang, path))
+    return sorted(found, key=lambda item: (item[0] != language, item[0]))
+
+async def mux_soft_subtitles(paths: dict, language: str, ass_style: dict, container: str, job: BurnJob = None):
+    """把各语言字幕作为字幕流和配音一起封装，视频流直接复制
+
+    mkv 使用带样式的 ASS 字幕流，mp4 使用 mov_text。
+    """
+    file_id_without_ext = paths['video'].stem
+    languages = find_subtitle_languages(file_id_without_ext, language)
+    work_dir = TEMP_DIR / f"{paths['output'].stem}_subs"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        subtitle_inputs = []
+        for lang, json_path in languages:
+            subtitles = read_json_subtitles(json_path)
+            if container == "mkv":
+                sub_path = cached_ass(subtitles, ass_style)
+            else:
+                sub_path = work_dir / f"{lang}.srt"
+                with open(sub_path, 'w', encoding='utf-8') as f:
+                    f.write(convert_to_srt(subtitles))
+            subtitle_inputs.append((lang, sub_path))
+
+        cmd = ['ffmpeg', '-y', '-i', str(paths['video']), '-i', str(paths['audio'])]
+        for _, sub_path in subtitle_inputs:
+            cmd.extend(['-i', str(sub_path)])
+        cmd.extend(['-map', '0:v', '-map', '1:a'])
+        for i in range(len(subtitle_inputs)):
+            cmd.extend(['-map', f'{i + 2}:s'])
+
+        cmd.extend([
+            '-c:v', 'copy',
+            # mkv 可以直接封装 MP3 配音，mp4 转为 AAC 以保证兼容性
+            '-c:a', 'copy' if container == "mkv" else 'aac',
+            '-c:s', 'ass' if container == "mkv" else 'mov_text',
+            '-metadata:s:a:0', f'language={language_tag(language)}'
+        ])
+        for i, (lang, _) in enumerate(subtitle_inputs):
+            cmd.extend([f'-metadata:s:s:{i}', f'language={language_tag(lang)}'])
+            cmd.extend([f'-disposition:s:{i}', 'default' if i == 0 else '0'])
+        if container == "mp4":
+            cmd.extend(['-movflags', '+faststart'])
+        cmd.append(str(paths['output']))
+
+        await run_ffmpeg(cmd, job)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
 def generate_ass_style(style: dict) -> str:
     """生成ASS样式定义"""
     try:
@@ -240,59 +824,24 @@ def generate_ass_style(style: dict) -> str:
     except (KeyError, ValueError) as e:
         raise ValueError(f"样式参数无效: {str(e)}")
 
-async def json_to_ass(json_path: Path, ass_path: Path, style: dict):
-    """将 JSON 格式的字幕转换为 ASS 格式"""
-    try:
-        print(f"开始转换字幕，JSON文件路径: {json_path}")
-        print(f"ASS文件将保存到: {ass_path}")
-        print("收到的样式参数:", style)
-        
-        # 读取 JSON 字幕
-        print("正在读取JSON字幕文件...")
-        subtitles = read_json_subtitles(json_path)
-        print(f"成功读取字幕，共 {len(subtitles)} 条")
-        
-        # 生成 ASS 内容
-        print("正在生成ASS内容...")
-        ass_content = generate_ass_content(subtitles, style)
-        print("ASS内容生成完成")
-        
-        # 写入 ASS 文件
-        print(f"正在写入ASS文件: {ass_path}")
-        write_ass_file(ass_path, ass_content)
-        print(f"ASS文件写入完成，文件大小: {ass_path.stat().st_size} 字节")
-
-        # 详细输出 ASS 文件内容
-        if ass_path.exists():
-            with open(ass_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                print("\n=== ASS 文件完整内容 ===")
-                print(content)
-                print("=== ASS 文件内容结束 ===\n")
-                
-                # 分析样式部分
-                style_section = [line for line in content.split('\n') if line.startswith('Style:')]
-                print("\n=== 样式分析 ===")
-                if style_section:
-                    print("找到样式定义:", style_section[0])
-                    parts = style_section[0].split(',')
-                    print("样式参数解析:")
-                    print(f"- 字体名称: {parts[1]}")
-                    print(f"- 字体大小: {parts[2]}")
-                    print(f"- 主要颜色: {parts[3]}")
-                    print(f"- 次要颜色: {parts[4]}")
-                    print(f"- 边框颜色: {parts[5]}")
-                    print(f"- 背景颜色: {parts[6]}")
-                    print(f"- 边框样式: {parts[15]}")
-                else:
-                    print("警告: 未找到样式定义")
-                print("=== 样式分析结束 ===\n")
-        else:
-            raise HTTPException(500, "ASS文件未成功生成")
+def cached_ass(subtitles: list, style: dict) -> Path:
+    """按 (字幕内容哈希, 样式哈希) 缓存的 ASS 文件，烧录、预览和软字幕封装共用
 
-    except Exception as e:
-        print(f"转换字幕格式失败: {str(e)}")
-        raise HTTPException(500, f"转换字幕格式失败: {str(e)}")
+    调用方只读取返回的文件，不能删除或修改。
+    """
+    ass_path = ASS_CACHE_DIR / f"{content_hash(subtitles)}_{content_hash(style)}.ass"
+    if ass_path.exists():
+        # 更新修改时间，清理时按最近使用排序
+        ass_path.touch()
+        return ass_path
+
+    ASS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    write_ass_stream(ass_path, subtitles, style)
+
+    cached = sorted(ASS_CACHE_DIR.glob("*.ass"), key=lambda path: path.stat().st_mtime_ns)
+    for path in cached[:max(0, len(cached) - ASS_CACHE_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+    return ass_path
 
 def read_json_subtitles(json_path: Path) -> list:
     """读取JSON字幕文件"""
@@ -304,19 +853,11 @@ def read_json_subtitles(json_path: Path) -> list:
     except Exception as e:
         raise ValueError(f"读取字幕文件失败: {str(e)}")
 
-def generate_ass_content(subtitles: list, style: dict) -> str:
-    """生成ASS文件内容"""
-    # 基础配置
-    ass_content = generate_ass_header()
-    
-    # 添加样式定义
-    style_line = generate_ass_style(style)
-    ass_content += style_line + "\n\n"
-    
-    # 添加事件格式定义和字幕内容
-    ass_content += generate_ass_events(subtitles)
-    
-    return ass_content
+def iter_ass_lines(subtitles: list, style: dict):
+    """逐行生成 ASS 文件内容：头部、样式定义、事件"""
+    yield generate_ass_header()
+    yield generate_ass_style(style) + "\n\n"
+    yield from iter_ass_events(subtitles)
 
 def generate_ass_header() -> str:
     """生成ASS文件头部"""
@@ -330,29 +871,30 @@ ScaledBorderAndShadow: yes
 Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
 """
 
-def generate_ass_events(subtitles: list) -> str:
-    """生成ASS事件部分"""
-    events = "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
-    
+def iter_ass_events(subtitles: list):
+    """逐行生成ASS事件"""
+    yield "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+
     for subtitle in subtitles:
         try:
             start_time = format_time(subtitle['start'])
             end_time = format_time(subtitle['start'] + subtitle['duration'])
             text = subtitle['text'].replace('\n', '\\N')
             # 移除可能影响背景显示的样式覆盖
-            events += f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}\n"
+            yield f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}\n"
         except KeyError as e:
             print(f"警告: 字幕格式错误，跳过此条字幕: {str(e)}")
             continue
-    
-    return events
 
-def write_ass_file(ass_path: Path, content: str):
-    """写入ASS文件"""
+def write_ass_stream(ass_path: Path, subtitles: list, style: dict):
+    """逐行写入ASS文件，先写临时文件再改名，读取方不会看到写了一半的文件"""
+    tmp_path = ass_path.with_name(f"{ass_path.name}.{os.getpid()}.tmp")
     try:
-        with open(ass_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(iter_ass_lines(subtitles, style))
+        os.replace(tmp_path, ass_path)
     except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         raise ValueError(f"写入ASS文件失败: {str(e)}")
 
 def format_time(seconds: float) -> str:
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .clips import file_stamp
+
+WINDOW_MANIFEST = "windows.json"
+WINDOW_PATTERN = re.compile(r"^(\d{5})\.(f32|stats\.f32)$")
+
+def signature(*parts) -> str:
+    """任意可 JSON 序列化内容的 sha1"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def clip_signature(clip) -> str:
+    """片段的渲染指纹：文件（修改时间、大小）和在时间线上的位置、时长、增益、变速比例"""
+    stamp = file_stamp(clip.path) if clip.path.exists() else None
+    return signature(
+        clip.path.name, stamp, round(clip.start, 6), round(clip.duration, 6),
+        clip.gain, round(clip.stretch, 4)
+    )
+
+def background_signature(background_path: Optional[Path], gain: float) -> Optional[str]:
+    """背景音轨的渲染指纹"""
+    if background_path is None or not gain:
+        return None
+    return signature(background_path.name, file_stamp(background_path), gain)
+
+class WindowCache:
+    """WINDOW_CACHE_DIR/<id>/<lang>：已渲染窗口的原始 PCM 及其响度统计缓存
+
+    windows.json 记录每个窗口的长度、背景音轨指纹，以及字幕索引到其片段指纹和
+    所覆盖窗口的依赖关系。重新合并时只有片段变化（新增、删除、移动、重新生成）
+    所涉及的新旧窗口，或背景音轨/音量变化时的全部窗口需要重新渲染。
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.path = cache_dir / WINDOW_MANIFEST
+        self.state: Dict = {}
+        self.load()
+
+    def load(self):
+        """读取缓存清单，文件不存在或损坏时视为空缓存"""
+        self.state = {}
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"读取窗口缓存清单失败，将全部重新渲染: {str(e)}")
+
+    def save(self):
+        """原子写入缓存清单，并删除多余的窗口文件"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+        window_count = len(self.state.get("windows", []))
+        for path in self.cache_dir.iterdir():
+            match = WINDOW_PATTERN.match(path.name)
+            if match and int(match.group(1)) >= window_count:
+                path.unlink(missing_ok=True)
+
+    def window_path(self, index: int) -> Path:
+        return self.cache_dir / f"{index:05d}.f32"
+
+    def stats_path(self, index: int) -> Path:
+        return self.cache_dir / f"{index:05d}.stats.f32"
+
+    def plan(
+        self,
+        sample_rate: int,
+        windows: List[Tuple[int, int]],
+        clip_windows: Dict[int, Tuple[str, List[int]]],
+        background: Optional[str]
+    ) -> Set[int]:
+        """比较新旧依赖关系，返回需要重新渲染的窗口，并把新的依赖关系记入 state（不写盘）
+        Args:
+            windows: [(开始, 长度)]（单位：采样点）
+            clip_windows: {字幕索引: (片段指纹, 覆盖的窗口列表)}
+            background: 背景音轨指纹
+        """
+        old = self.state
+        lengths = [length for _, length in windows]
+
+        if old.get("sample_rate") != sample_rate or old.get("background") != background:
+            dirty = set(range(len(windows)))
+        else:
+            old_lengths = old.get("windows", [])
+            dirty = {
+                i for i, length in enumerate(lengths)
+                if i >= len(old_lengths) or old_lengths[i] != length
+            }
+            old_clips = {int(k): v for k, v in old.get("clips", {}).items()}
+            for index in set(old_clips) | set(clip_windows):
+                before, after = old_clips.get(index), clip_windows.get(index)
+                if before is not None and after is not None and before["sig"] == after[0]:
+                    continue
+                # 片段变化时，它原来覆盖和现在覆盖的窗口都需要重新渲染
+                if before is not None:
+                    dirty.update(before["windows"])
+                if after is not None:
+                    dirty.update(after[1])
+
+        dirty.update(i for i in range(len(windows)) if not self.window_path(i).exists())
+        dirty = {i for i in dirty if i < len(windows)}
+        if dirty:
+            # 渲染中途失败时，磁盘上的窗口与旧清单不再一致，先作废旧清单
+            self.path.unlink(missing_ok=True)
+
+        self.state = {
+            "sample_rate": sample_rate,
+            "background": background,
+            "windows": lengths,
+            "clips": {
+                str(index): {"sig": sig, "windows": covered}
+                for index, (sig, covered) in sorted(clip_windows.items())
+            }
+        }
+        return dirty
+
+    def _write(self, path: Path, data: np.ndarray):
+        tmp_path = path.with_name(path.name + ".tmp")
+        np.ascontiguousarray(data, dtype=np.float32).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def store(self, index: int, samples: np.ndarray, stats: Optional[np.ndarray] = None):
+        """原子写入一个已渲染的窗口及其响度统计"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.stats_path(index).unlink(missing_ok=True)
+        self._write(self.window_path(index), samples)
+        if stats is not None:
+            self._write(self.stats_path(index), stats)
+
+    def store_stats(self, index: int, stats: np.ndarray):
+        """补记窗口的响度统计"""
+        self._write(self.stats_path(index), stats)
+
+    def read_stats(self, index: int) -> Optional[np.ndarray]:
+        """读取窗口的响度统计，缺失时返回 None"""
+        path = self.stats_path(index)
+        if not path.exists():
+            return None
+        return np.fromfile(path, dtype=np.float32)
+
+    def read(self, index: int) -> np.ndarray:
+        """以内存映射方式读取缓存的窗口"""
+        path = self.window_path(index)
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r")
@@ -401,7 +401,7 @@ async function displaySubtitles(fileId, subtitleData, translationData = null) {
                     </div>
                     <div class="audio-player" style="display: none;">
                         <audio controls class="subtitle-audio">
-                            <source src="" type="audio/mpeg">
+                            <source src="" type="audio/flac">
                             您的浏览器不支持音频播放。
                         </audio>
                     </div>
@@ -1176,7 +1176,7 @@ async function generateSingleSpeech(index) {
             const timestamp = new Date().getTime();
             const source = audio.querySelector('source');
             source.src = `/audio/${data.audio_file}?t=${timestamp}`;
-            source.type = 'audio/wav';
+            source.type = 'audio/flac';
             audio.load();
             audioPlayer.style.display = 'block';
 
@@ -1289,7 +1289,7 @@ function updateSubtitleAudio(audioFiles) {
             }
 
             source.src = audioPath;
-            source.type = 'audio/wav';
+            source.type = 'audio/flac';
             audio.load(); // 重新加载音频源
             audioPlayer.style.display = 'block';
 